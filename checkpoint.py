@@ -0,0 +1,120 @@
+# Stage manifests and record checkpoints so pipeline stages can be skipped or resumed
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+_HASH_CHUNK = 4 * 1024 * 1024
+
+
+def file_fingerprint(path):
+    """Cheap identity for large inputs (dumps, intermediates): size and modification time."""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_sha256(path):
+    """Content hash for small but important inputs (classifier artifact, notable CSV)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stage_path(output_path):
+    return Path(f"{output_path}.stage.json")
+
+
+def _progress_path(output_path):
+    return Path(f"{output_path}.progress.json")
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _normalize(inputs):
+    # Round-trip through JSON so tuples/lists and key order compare equal to what was stored
+    return json.loads(json.dumps(inputs, sort_keys=True))
+
+
+def is_stage_current(output_path, inputs):
+    """True when output_path was completed by a previous run with exactly these inputs."""
+    if not Path(output_path).exists():
+        return False
+    manifest = _read_json(_stage_path(output_path))
+    return bool(manifest) and manifest.get('inputs') == _normalize(inputs)
+
+
+def mark_stage_complete(output_path, inputs):
+    """Record that output_path is complete for these inputs and drop any partial progress."""
+    _write_json_atomic(_stage_path(output_path), {'inputs': _normalize(inputs), 'completed_at': time.time()})
+    _progress_path(output_path).unlink(missing_ok=True)
+
+
+def clear_stage(output_path):
+    """Forget manifest and progress for output_path (e.g. after a shard was merged and deleted)."""
+    _stage_path(output_path).unlink(missing_ok=True)
+    _progress_path(output_path).unlink(missing_ok=True)
+
+
+class RecordCheckpoint:
+    """
+    Track how many input records a stage has fully written so a crashed run can resume.
+
+    Progress stores the input record count and the output byte size at that point, plus the
+    records among them that failed and must be redone. On resume the output is truncated
+    back to that size (dropping a half-written tail) and the caller skips the recorded
+    number of input records, except the failed ones, before appending.
+    """
+
+    def __init__(self, output_path, inputs, interval=5.0):
+        self.output_path = Path(output_path)
+        self.inputs = _normalize(inputs)
+        self.interval = interval
+        self.failed = []  # record numbers to redo, set by resume()
+        self._last_write = 0.0
+
+    def resume(self, enabled=True):
+        """Return the number of input records already done; prepares output_path for appending."""
+        progress = _read_json(_progress_path(self.output_path)) if enabled else None
+        if progress and progress.get('inputs') == self.inputs and self.output_path.exists():
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(progress['output_bytes'])
+            self.failed = progress.get('failed', [])
+            return progress['records']
+
+        clear_stage(self.output_path)
+        open(self.output_path, 'w', encoding='utf-8').close()
+        return 0
+
+    def update(self, outfile, records, force=False, failed=()):
+        """Persist progress after `records` input records (`failed` of them to redo); throttled to once per interval."""
+        now = time.monotonic()
+        if not force and now - self._last_write < self.interval:
+            return
+        outfile.flush()
+        os.fsync(outfile.fileno())
+        _write_json_atomic(_progress_path(self.output_path), {
+            'inputs': self.inputs,
+            'records': records,
+            'failed': sorted(failed),
+            'output_bytes': os.fstat(outfile.fileno()).st_size,
+        })
+        self._last_write = now
+
+    def complete(self):
+        mark_stage_complete(self.output_path, self.inputs)
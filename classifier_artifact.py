@@ -0,0 +1,99 @@
+# Residence classifier stored as plain files instead of one pickled (embedder, classifier) tuple:
+# the SentenceTransformer directory with safetensors weights (memory-mapped when loaded) and the
+# logistic regression coefficients as numpy arrays
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from checkpoint import file_sha256
+
+MODEL_DIR = Path(__file__).resolve().parent / "residence_classifier"
+LEGACY_MODEL_PATH = Path(__file__).resolve().parent / "residence_classifier.joblib"
+_EMBEDDER_DIR = "embedder"
+_CLASSIFIER_NAME = "classifier.npz"
+_META_NAME = "meta.json"
+
+
+class LinearClassifier:
+    """Binary logistic regression from its coefficient arrays, with sklearn's predict_proba."""
+
+    def __init__(self, coef, intercept, classes):
+        # float64 like sklearn, so probabilities match the fitted model exactly
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = np.asarray(intercept, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_sklearn(cls, clf):
+        return cls(clf.coef_, clf.intercept_, clf.classes_)
+
+    @classmethod
+    def load(cls, path):
+        arrays = np.load(path)
+        return cls(arrays["coef"], arrays["intercept"], arrays["classes"])
+
+    def save(self, path):
+        np.savez(path, coef=self.coef_, intercept=self.intercept_, classes=self.classes_)
+
+    def predict_proba(self, X):
+        scores = np.asarray(X) @ self.coef_[0] + self.intercept_[0]
+        positive = 1.0 / (1.0 + np.exp(-scores))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def save_model(embedder, clf, model_dir=MODEL_DIR):
+    """
+    Write a trained (SentenceTransformer, LogisticRegression) pair to `model_dir`.
+
+    The directory is assembled next to the target and renamed into place, so a reader never
+    sees a half-written artifact. meta.json lists the sha256 of every file.
+    """
+    model_dir = Path(model_dir)
+    tmp_dir = model_dir.with_name(f"{model_dir.name}.tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+    embedder.save(str(tmp_dir / _EMBEDDER_DIR), safe_serialization=True)
+    LinearClassifier.from_sklearn(clf).save(tmp_dir / _CLASSIFIER_NAME)
+    files = sorted(path for path in tmp_dir.rglob("*") if path.is_file())
+    meta = {"files": {str(path.relative_to(tmp_dir)): file_sha256(path) for path in files}}
+    (tmp_dir / _META_NAME).write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+    if model_dir.exists():
+        shutil.rmtree(model_dir)
+    tmp_dir.rename(model_dir)
+    return model_dir
+
+
+def load_model(model_dir=MODEL_DIR):
+    """Return the (embedder, classifier) pair saved by save_model."""
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = Path(model_dir)
+    embedder = SentenceTransformer(str(model_dir / _EMBEDDER_DIR))
+    return embedder, LinearClassifier.load(model_dir / _CLASSIFIER_NAME)
+
+
+def model_hash(model_dir=MODEL_DIR):
+    """sha256 identifying a saved artifact (None if missing)."""
+    meta_path = Path(model_dir) / _META_NAME
+    return file_sha256(meta_path) if meta_path.exists() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a pickled residence_classifier.joblib to the file artifact.")
+    parser.add_argument("--joblib", type=Path, default=LEGACY_MODEL_PATH, help="Pickled (embedder, classifier) tuple.")
+    parser.add_argument("--output", type=Path, default=MODEL_DIR, help="Artifact directory to write.")
+    args = parser.parse_args()
+
+    import joblib
+
+    embedder, clf = joblib.load(args.joblib)
+    save_model(embedder, clf, args.output)
+    print(f"Classifier artifact written to {args.output}; {args.joblib} can be removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Adaptive cap on in-flight LLM requests, driven by observed latency and errors
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import List, Optional, Tuple
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that follows the server's capacity (a latency-gradient controller).
+
+    The limit is adjusted once per round trip, from the mean latency of the requests completed in
+    it; reacting to every sample would overshoot before the last change has taken effect. A short
+    average of those means tracks current conditions and a baseline remembers the best average
+    seen, the unloaded latency. The baseline creeps up by `drift` per round so it can follow a
+    lasting change in request size. While short stays within `tolerance` x baseline the server
+    keeps up, and the limit grows by about sqrt(limit) per adjustment to probe for headroom. Once
+    requests queue on the server the short average rises, the gradient tolerance x baseline / short
+    drops below 1, and the limit shrinks in proportion with no headroom added. Errors and timeouts
+    halve the limit (at most once per `cooldown` seconds). With min_limit == max_limit the limit is
+    fixed.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        tolerance: float = 1.5,
+        smoothing: float = 0.5,
+        cooldown: float = 2.0,
+        drift: float = 0.001,
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.drift = drift
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.history: List[Tuple[float, int]] = []  # (monotonic time, limit) after each change
+        self._short: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._round: List[float] = []
+        self._round_start = time.monotonic()
+        self._last_drop = 0.0
+        self._changed = asyncio.Condition()
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_limit < self.max_limit
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self) -> None:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float], failed: bool = False) -> None:
+        async with self._changed:
+            self.in_flight -= 1
+            before = int(self.limit)
+            if failed:
+                self.failed += 1
+                self._on_drop()
+            elif latency is not None:
+                self.completed += 1
+                self._on_sample(latency)
+            if int(self.limit) != before:
+                self.history.append((time.monotonic(), int(self.limit)))
+            self._changed.notify_all()
+
+    def slot(self) -> "_Slot":
+        """`async with limiter.slot():` holds one request slot and reports its latency (or failure)."""
+        return _Slot(self)
+
+    def _on_sample(self, latency: float) -> None:
+        self._round.append(latency)
+        now = time.monotonic()
+        if self._short is not None and now - self._round_start < self._short:
+            return
+        latency = sum(self._round) / len(self._round)
+        self._round.clear()
+        self._round_start = now
+        if self._short is None:
+            self._short = self._baseline = latency
+        self._short = 0.5 * self._short + 0.5 * latency
+        self._baseline = min(self._baseline * (1 + self.drift), self._short)
+        if not self.adaptive:
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * self._baseline / self._short))
+        # At small limits sqrt(limit) outweighs the largest cut, so it must not apply while queueing
+        headroom = math.sqrt(self.limit) if gradient >= 1.0 else 0.0
+        target = self.limit * gradient + headroom
+        self.limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+
+    def _on_drop(self) -> None:
+        now = time.monotonic()
+        if not self.adaptive or now - self._last_drop < self.cooldown:
+            return
+        self._last_drop = now
+        self.limit = max(self.min_limit, self.limit * 0.5)
+
+
+class _Slot:
+    def __init__(self, limiter: AdaptiveLimiter) -> None:
+        self._limiter = limiter
+        self._t0 = 0.0
+
+    async def __aenter__(self) -> "_Slot":
+        await self._limiter.acquire()
+        self._t0 = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        failed = exc_type is not None and not issubclass(exc_type, asyncio.CancelledError)
+        latency = None if exc_type is not None else time.perf_counter() - self._t0
+        await self._limiter.release(latency, failed)
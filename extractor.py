@@ -1,11 +1,33 @@
 import csv
+import gc
+import importlib.util
+import itertools
 import json
+import multiprocessing
+import os
 import random
 import re
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import joblib
 import mwparserfromhell
+from mwparserfromhell.nodes import Heading
+
+import metrics
+from checkpoint import (
+    RecordCheckpoint,
+    clear_stage,
+    file_fingerprint,
+    file_sha256,
+    is_stage_current,
+    mark_stage_complete,
+)
+from parser import iter_indexed_lines, load_title_index, title_index_path
+from score_cache import SentenceScoreCache
 
 SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9])')
 
@@ -13,21 +35,193 @@ SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9])')
 _EMBEDDER = None
 _CLF = None
 _THRESHOLD = 0.5  # probability threshold for class=1, decision boundary
-_MODEL_PATH = Path(__file__).resolve().parent / "residence_classifier.joblib"
+_MODEL_DIR = Path(__file__).resolve().parent / "residence_classifier"  # see classifier_artifact.py
+_MODEL_PATH = Path(__file__).resolve().parent / "residence_classifier.joblib"  # older pickled artifact
+# Classifier backend: "fp32" (the artifact above), "int8" (the quantized export written by
+# train_classifier.py with EXPORT_INT8=1) or "auto" = int8 when it is exported and onnxruntime is installed
+_BACKEND = os.getenv("EXTRACT_EMBEDDER", "auto")
+
+# Cross-article batching: sentences from many articles are pooled, sorted by length and
+# embedded in batches of similar length so short biographies don't produce tiny batches
+# and long sentences don't pad out short ones.
+EMBED_BATCH_SIZE = int(os.getenv("EXTRACT_EMBED_BATCH_SIZE", "256"))  # max sentences per encode call
+EMBED_POOL_SENTENCES = int(os.getenv("EXTRACT_POOL_SENTENCES", "8192"))  # sentences pooled before embedding
+EMBED_MAX_PAD_RATIO = float(os.getenv("EXTRACT_MAX_PAD_RATIO", "2.0"))  # longest/shortest tokens per batch
+_EMBED_STATS = {'sentences': 0, 'seconds': 0.0, 'prefiltered': 0}
+_SENTENCES_SCORED = metrics.counter("pipeline_sentences_scored_total", "Distinct sentences sent to the residence classifier.")
+_SENTENCES_PREFILTERED = metrics.counter(
+    "pipeline_sentences_prefiltered_total", "Sentences the lexical prefilter rejected before embedding."
+)
+_SCORE_CACHE_HITS = metrics.counter("pipeline_score_cache_hits_total", "Sentences scored from the score cache.")
+_SENTENCES_EMBEDDED = metrics.counter("pipeline_sentences_embedded_total", "Sentences run through the embedder.")
+_CLASSIFIER_POSITIVES = metrics.counter(
+    "pipeline_classifier_positives_total", "Sentences kept as residence sentences (above the threshold)."
+)
+_ARTICLES_EXTRACTED = metrics.counter("pipeline_articles_extracted_total", "Notable articles scored by the extractor.")
+_EXTRACT_BYTES_OUT = metrics.counter("pipeline_extract_bytes_out_total", "JSONL bytes written by the extractor.")
+_EMBED_BATCH_SECONDS = metrics.histogram("pipeline_embed_batch_seconds", "Seconds per embed + classify batch.")
+
+# Wikitext stripping and sentence splitting run in a process pool that feeds the single
+# embedding consumer; at most STRIP_WORKERS * STRIP_QUEUE_DEPTH chunks are in flight.
+STRIP_WORKERS = int(os.getenv("EXTRACT_STRIP_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+STRIP_CHUNK_LINES = int(os.getenv("EXTRACT_STRIP_CHUNK_LINES", "64"))  # JSONL lines per pool task
+STRIP_QUEUE_DEPTH = 2
+_WORKER_TITLES = None  # notable titles, set in each strip worker by _init_strip_worker
+
+# Section-aware mode keeps only biographical sections (matched as substrings of the level-2
+# heading; "lead" is the text before the first heading) and drops templates, tables and refs.
+BIO_SECTIONS_ONLY = os.getenv("EXTRACT_BIO_SECTIONS_ONLY", "0") == "1"
+BIO_SECTIONS = tuple(
+    name.strip().lower()
+    for name in os.getenv(
+        "EXTRACT_BIO_SECTIONS",
+        "lead,early life,personal life,later life,life,biography,background,childhood,family,residence,death",
+    ).split(",")
+    if name.strip()
+)
+SECTION_REPORT = os.getenv("EXTRACT_SECTION_REPORT", "0") == "1"  # also count full-article sentences
+_DROPPED_TAGS = {'ref', 'table', 'gallery', 'references', 'timeline'}
+_SECTION_STATS = {'articles': 0, 'kept': 0, 'full': 0}
+
+# Scores of previously classified sentences persist across runs; set EXTRACT_SCORE_CACHE="" to disable
+_SCORE_CACHE_PATH = os.getenv("EXTRACT_SCORE_CACHE", str(Path(__file__).resolve().parent / "sentence_scores.sqlite"))
+_SCORE_CACHE_MAX = int(os.getenv("EXTRACT_SCORE_CACHE_MAX", "20000000"))  # max cached sentences
+_SCORE_CACHE = None
+
+# Optional lexical cascade (residence_prefilter.joblib from train_classifier.py): sentences it rejects
+# are scored 0 without embedding. It trades a little recall for speed, so it only runs with
+# EXTRACT_PREFILTER=1; EXTRACT_PREFILTER_RECALL overrides the recall target it was trained with.
+_PREFILTER_ENABLED = os.getenv("EXTRACT_PREFILTER", "0") == "1"
+_PREFILTER_RECALL = os.getenv("EXTRACT_PREFILTER_RECALL")
+_PREFILTER = None
+_PREFILTER_THRESHOLD = None
+
+def _use_quantized():
+    """Whether the int8 backend is selected (see EXTRACT_EMBEDDER)."""
+    if _BACKEND != "auto":
+        return _BACKEND == "int8"
+    from quantized_embedder import QUANTIZED_DIR
+    return (QUANTIZED_DIR / "meta.json").exists() and all(
+        importlib.util.find_spec(name) is not None for name in ("onnxruntime", "tokenizers")
+    )
+
 
 def _load_model():
-    """Load the (embedder, classifier) tuple saved by train_classifier.py."""
+    """Load the (embedder, classifier) pair saved by train_classifier.py, fp32 or int8."""
     global _EMBEDDER, _CLF
     if _EMBEDDER is not None and _CLF is not None:
         return
     try:
-        print("Loading residence classifier model...")
-        _EMBEDDER, _CLF = joblib.load(_MODEL_PATH)
+        if _use_quantized():
+            from quantized_embedder import QUANTIZED_DIR, load_quantized
+            print(f"Loading int8 residence classifier from {QUANTIZED_DIR}...")
+            _EMBEDDER, _CLF = load_quantized()
+        elif _MODEL_DIR.is_dir():
+            from classifier_artifact import load_model
+            print("Loading residence classifier model...")
+            _EMBEDDER, _CLF = load_model(_MODEL_DIR)
+        else:
+            print(f"Loading residence classifier model from {_MODEL_PATH} (convert it with classifier_artifact.py)...")
+            _EMBEDDER, _CLF = joblib.load(_MODEL_PATH)
     except Exception as e:
-        print(f"Warning: unable to load model at {_MODEL_PATH}: {e}")
+        print(f"Warning: unable to load the residence classifier: {e}")
         _EMBEDDER, _CLF = None, None
 
 
+def _process_context(share_model=False):
+    """
+    Multiprocessing context for extraction workers.
+
+    Workers are spawned: thread pools the parent may hold (torch, ONNX Runtime) and an initialized
+    CUDA context are not carried into a forked child. They fork only to share a model loaded in
+    this process, which _can_share_model allows when none of that applies.
+    """
+    return multiprocessing.get_context('fork' if share_model else 'spawn')
+
+
+def _can_share_model():
+    """Whether a model loaded in this process keeps working in forked workers (see _process_context)."""
+    if _use_quantized():
+        return False
+    # NVML answers whether CUDA is usable without initializing it here
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    try:
+        import torch
+    except ImportError:
+        return True  # no torch, no CUDA
+    return not torch.cuda.is_available()
+
+
+def _get_score_cache():
+    """Open the sentence score cache for the current classifier artifact (None when disabled)."""
+    global _SCORE_CACHE
+    if _SCORE_CACHE is None and _SCORE_CACHE_PATH:
+        model_hash = classifier_hash()
+        if model_hash is not None:
+            _SCORE_CACHE = SentenceScoreCache(_SCORE_CACHE_PATH, model_hash, _SCORE_CACHE_MAX)
+    return _SCORE_CACHE
+
+
+def _load_prefilter():
+    """Load the lexical prefilter if enabled and trained; returns None otherwise."""
+    global _PREFILTER, _PREFILTER_THRESHOLD
+    if _PREFILTER is not None or not _PREFILTER_ENABLED:
+        return _PREFILTER
+    # Imported lazily so strip workers don't pay for sklearn/numpy
+    from prefilter import PREFILTER_PATH, threshold_for_recall
+    if not PREFILTER_PATH.exists():
+        return None
+    try:
+        _PREFILTER = joblib.load(PREFILTER_PATH)
+    except Exception as e:
+        print(f"Warning: unable to load prefilter at {PREFILTER_PATH}: {e}")
+        return None
+    _PREFILTER_THRESHOLD = _PREFILTER['threshold']
+    if _PREFILTER_RECALL:
+        _PREFILTER_THRESHOLD = threshold_for_recall(_PREFILTER['positive_scores'], float(_PREFILTER_RECALL))
+    print(f"Using lexical prefilter (threshold {_PREFILTER_THRESHOLD:.3f})")
+    return _PREFILTER
+
+
+def _prefilter_fingerprint():
+    """Prefilter identity for the extract-stage manifest (None when it is not used)."""
+    if not _PREFILTER_ENABLED:
+        return None
+    from prefilter import PREFILTER_PATH
+    if not PREFILTER_PATH.exists():
+        return None
+    return {'sha256': file_sha256(PREFILTER_PATH), 'recall': _PREFILTER_RECALL}
+
+
+def classifier_hash():
+    """sha256 of the classifier artifact in use (None if missing); part of every extract-stage manifest."""
+    if _use_quantized():
+        # int8 scores differ slightly from fp32, so they get their own manifests and score cache
+        from quantized_embedder import quantized_hash
+        return quantized_hash()
+    if _MODEL_DIR.is_dir():
+        from classifier_artifact import model_hash
+        return model_hash(_MODEL_DIR)
+    return file_sha256(_MODEL_PATH) if _MODEL_PATH.exists() else None
+
+
+def extract_stage_inputs(input_paths, notable_csv, model_hash=None):
+    """Inputs recorded in the extract-stage manifest (see checkpoint.is_stage_current)."""
+    return {
+        'stage': 'extract',
+        'pages': {str(p): file_fingerprint(p) for p in input_paths},
+        # Record numbering for resume differs between indexed reads and full scans
+        'title_indexes': {
+            str(p): file_fingerprint(title_index_path(p)) for p in input_paths if os.path.exists(title_index_path(p))
+        },
+        'classifier_sha256': model_hash if model_hash is not None else classifier_hash(),
+        'notable_csv_sha256': file_sha256(notable_csv),
+        'threshold': _THRESHOLD,
+        'prefilter': _prefilter_fingerprint(),
+        'bio_sections': list(BIO_SECTIONS) if BIO_SECTIONS_ONLY else None,
+    }
+
+
 def load_famous_name_map(notable_csv):
     """Return a mapping of canonical article titles to their raw CSV tokens."""
     title_map = {}
@@ -41,41 +235,267 @@ def load_famous_name_map(notable_csv):
     return title_map
 
 
-def extract_residence_sentences(wikitext):
-    """Return sentences from the article text that refer to residences."""
-    plain_text = mwparserfromhell.parse(wikitext).strip_code()
+def _biographical_text(wikitext):
+    """Plain text of the configured biographical sections, without templates, tables or refs."""
+    code = mwparserfromhell.parse(wikitext)
+    kept = []
+    for section in code.get_sections(levels=[2], include_lead=True):
+        first = section.nodes[0] if section.nodes else None
+        if isinstance(first, Heading):
+            heading = first.title.strip_code().strip().lower()
+            if not any(name in heading for name in BIO_SECTIONS):
+                continue
+        elif 'lead' not in BIO_SECTIONS:
+            continue
+
+        for node in section.filter_templates(recursive=False) + section.filter_tags(
+            matches=lambda n: str(n.tag).lower() in _DROPPED_TAGS
+        ):
+            try:
+                section.remove(node)
+            except ValueError:
+                pass  # already gone with an enclosing node
+        kept.append(section.strip_code())
+    return ' '.join(kept)
+
+
+def _split_sentences(wikitext, bio_sections_only=None):
+    """Strip wiki markup and split the plain text into sentences."""
+    if bio_sections_only is None:
+        bio_sections_only = BIO_SECTIONS_ONLY
+    if bio_sections_only:
+        plain_text = _biographical_text(wikitext)
+    else:
+        plain_text = mwparserfromhell.parse(wikitext).strip_code()
     plain_text = re.sub(r'\s+', ' ', plain_text).strip()
     if not plain_text:
         return []
 
-    sentences = [s.strip() for s in SENTENCE_SPLIT_RE.split(plain_text) if s.strip()]
-    if not sentences:
-        return []
+    return [s.strip() for s in SENTENCE_SPLIT_RE.split(plain_text) if s.strip()]
 
-    _load_model()
-    if _EMBEDDER is None or _CLF is None:
-        # Model not available; return no matches
-        return []
 
-    # Embed all sentences in a single batch for efficiency
-    print("Embedding and classifying residence sentences...")
-    X = _EMBEDDER.encode(sentences, show_progress_bar=False)
-    probs = _CLF.predict_proba(X)[:, 1]
+def _length_batches(sentences):
+    """Yield index lists of similar token length, at most EMBED_BATCH_SIZE long."""
+    lengths = [max(1, len(s.split())) for s in sentences]  # whitespace tokens approximate wordpieces
+    batch = []
+    batch_min = 0
+    for i in sorted(range(len(sentences)), key=lengths.__getitem__):
+        if batch and (len(batch) >= EMBED_BATCH_SIZE or lengths[i] > batch_min * EMBED_MAX_PAD_RATIO):
+            yield batch
+            batch = []
+        if not batch:
+            batch_min = lengths[i]
+        batch.append(i)
+    if batch:
+        yield batch
+
+
+def _score_sentences(sentences):
+    """Return the residence probability of each sentence (model must be loaded)."""
+    probs = [0.0] * len(sentences)
+    positions = {}  # distinct sentence -> indices in `sentences`
+    for i, sent in enumerate(sentences):
+        positions.setdefault(sent, []).append(i)
+    candidates = list(positions)
+    _SENTENCES_SCORED.inc(len(candidates))
+
+    # Sentences the lexical cascade rejects keep probability 0 without being embedded
+    prefilter = _load_prefilter()
+    if prefilter is not None and candidates:
+        from prefilter import prefilter_mask
+        keep = prefilter_mask(prefilter, candidates, _PREFILTER_THRESHOLD)
+        _EMBED_STATS['prefiltered'] += len(candidates) - int(keep.sum())
+        _SENTENCES_PREFILTERED.inc(len(candidates) - int(keep.sum()))
+        candidates = [sent for sent, k in zip(candidates, keep) if k]
+
+    # Only sentences the classifier has never seen are embedded, each distinct one once
+    cache = _get_score_cache()
+    cached = cache.get_many(candidates) if cache is not None else {}
+    _SCORE_CACHE_HITS.inc(len(cached))
+    for j, p in cached.items():
+        for i in positions[candidates[j]]:
+            probs[i] = p
+    todo_sentences = [sent for j, sent in enumerate(candidates) if j not in cached]
 
+    todo_scores = [0.0] * len(todo_sentences)
+    t0 = time.perf_counter()
+    for batch in _length_batches(todo_sentences):
+        with _EMBED_BATCH_SECONDS.time():
+            X = _EMBEDDER.encode([todo_sentences[j] for j in batch], batch_size=len(batch), show_progress_bar=False)
+            batch_probs = _CLF.predict_proba(X)[:, 1]
+        for j, p in zip(batch, batch_probs):
+            todo_scores[j] = p
+            for i in positions[todo_sentences[j]]:
+                probs[i] = p
+    _EMBED_STATS['sentences'] += len(todo_sentences)
+    _SENTENCES_EMBEDDED.inc(len(todo_sentences))
+    _EMBED_STATS['seconds'] += time.perf_counter() - t0
+
+    if cache is not None and todo_sentences:
+        cache.put_many(todo_sentences, todo_scores)
+    return probs
+
+
+def _select_matches(sentences, probs):
+    """Keep sentences above the threshold, dropping duplicates but preserving order."""
     matches = []
     seen = set()
     for sent, p in zip(sentences, probs):
         if p >= _THRESHOLD and sent not in seen:
             matches.append(sent)
             seen.add(sent)
+    _CLASSIFIER_POSITIVES.inc(len(matches))
     return matches
 
 
-def process_pages(input_jsonl, output_jsonl, notable_csv):
-    """Process JSONL wiki pages and extract residence sentences for notable people."""
-    famous_titles = load_famous_name_map(notable_csv)
+def extract_residence_sentences(wikitext):
+    """Return sentences from the article text that refer to residences."""
+    sentences = _split_sentences(wikitext)
+    if not sentences:
+        return []
 
-    # debug: print some sample names
+    _load_model()
+    if _EMBEDDER is None or _CLF is None:
+        # Model not available; return no matches
+        return []
+
+    return _select_matches(sentences, _score_sentences(sentences))
+
+
+def _score_pending(pending):
+    """Embed the sentences of all pending (title, sentences) articles together; return their records in order."""
+    _load_model()
+    model_ready = _EMBEDDER is not None and _CLF is not None
+    flat = [sent for _, sentences in pending for sent in sentences]
+    if flat and not model_ready:
+        # Writing empty records would let the stage be marked complete without any extraction
+        raise RuntimeError("residence classifier is unavailable; cannot extract residence sentences")
+    probs = _score_sentences(flat) if flat else []
+
+    records = []
+    offset = 0
+    for title, sentences in pending:
+        article_probs = probs[offset:offset + len(sentences)]
+        offset += len(sentences)
+        records.append({
+            'name': title,
+            'residence_sentences': _select_matches(sentences, article_probs),
+        })
+    _ARTICLES_EXTRACTED.inc(len(records))
+    return records
+
+
+def _write_pending(pending, outfile):
+    """Embed the sentences of all pending articles together, then write their records in order."""
+    for output_record in _score_pending(pending):
+        line = json.dumps(output_record) + '\n'
+        outfile.write(line)
+        _EXTRACT_BYTES_OUT.inc(len(line))
+    pending.clear()
+
+
+def _report_embedding_rate(label):
+    seconds = _EMBED_STATS['seconds']
+    rate = _EMBED_STATS['sentences'] / seconds if seconds else 0.0
+    print(f"{label}: embedded {_EMBED_STATS['sentences']} sentences in {seconds:.2f}s ({rate:.0f} sentences/s)")
+    if _SECTION_STATS['articles']:
+        articles = _SECTION_STATS['articles']
+        saved = _SECTION_STATS['full'] - _SECTION_STATS['kept']
+        per_sentence = seconds / _EMBED_STATS['sentences'] if _EMBED_STATS['sentences'] else 0.0
+        print(
+            f"{label}: biographical sections kept {_SECTION_STATS['kept']} of {_SECTION_STATS['full']} sentences; "
+            f"{saved / articles:.1f} sentences and ~{saved * per_sentence / articles * 1000:.1f} ms of embedding "
+            f"saved per article ({saved * per_sentence:.1f}s total)"
+        )
+    if _PREFILTER is not None:
+        print(f"{label}: lexical prefilter skipped embedding for {_EMBED_STATS['prefiltered']} sentences")
+    if _SCORE_CACHE is not None:
+        stats = _SCORE_CACHE.stats()
+        print(
+            f"{label}: score cache {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, {stats['evicted']} evicted"
+        )
+
+
+def _init_strip_worker(famous_titles):
+    global _WORKER_TITLES
+    _WORKER_TITLES = famous_titles
+
+
+def _split_page_lines(numbered_lines, famous_titles=None):
+    """
+    Decode JSONL page lines and return (line_no, title, sentences, full_count) for the notable ones.
+
+    full_count is the sentence count without section filtering when the section report is on
+    (None otherwise).
+    """
+    if famous_titles is None:
+        famous_titles = _WORKER_TITLES
+    results = []
+    for line_no, line in numbered_lines:
+        page = json.loads(line)
+        title = page.get('title', '')
+        text = page.get('text') or ''
+
+        normalized_title = title.strip().upper()
+
+        if normalized_title not in famous_titles:
+            continue
+
+        sentences = _split_sentences(text)
+        full_count = None
+        if BIO_SECTIONS_ONLY and SECTION_REPORT:
+            full_count = len(_split_sentences(text, bio_sections_only=False))
+        results.append((line_no, title, sentences, full_count))
+    return results
+
+
+def _numbered_page_lines(input_jsonl, famous_titles, done):
+    """
+    Yield (record_no, line) for the records after `done` that may belong to notable people.
+
+    With a valid title index next to input_jsonl only the notable records are read (via mmap);
+    otherwise every line of the file is scanned.
+    """
+    entries = load_title_index(input_jsonl, famous_titles)
+    if entries is not None:
+        print(f"Using title index: reading {len(entries)} matching records from {input_jsonl}")
+        yield from enumerate(iter_indexed_lines(input_jsonl, entries[done:]), done + 1)
+        return
+
+    with open(input_jsonl, 'r', encoding='utf-8') as infile:
+        for line_no, line in enumerate(infile, 1):
+            if line_no > done:
+                yield line_no, line
+
+
+def _iter_split_pages(numbered_lines, famous_titles, workers):
+    """
+    Yield (line_no, title, sentences, full_count) for notable pages, in input order.
+
+    Lines are sent to the strip pool in chunks; only a bounded window of chunks is in flight
+    so memory stays flat while the caller is busy embedding.
+    """
+    chunks = iter(lambda: list(itertools.islice(numbered_lines, STRIP_CHUNK_LINES)), [])
+    if workers <= 0:  # even one worker overlaps stripping with the caller's embedding
+        for chunk in chunks:
+            yield from _split_page_lines(chunk, famous_titles)
+        return
+
+    with ProcessPoolExecutor(
+        workers, mp_context=_process_context(), initializer=_init_strip_worker, initargs=(famous_titles,)
+    ) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_split_page_lines, chunk))
+            if len(in_flight) >= workers * STRIP_QUEUE_DEPTH:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def _print_sample_titles(famous_titles):
+    """Debug helper: print a few random names loaded from the notable CSV."""
     sample_titles = random.sample(
         list(famous_titles.keys()),
         k=min(15, len(famous_titles)),
@@ -85,21 +505,111 @@ def process_pages(input_jsonl, output_jsonl, notable_csv):
         for name in sample_titles:
             print(f"Notable person: {name}")
 
-    with open(input_jsonl, 'r', encoding='utf-8') as infile, \
-            open(output_jsonl, 'w', encoding='utf-8') as outfile:
-        for line in infile:
-            page = json.loads(line)
-            title = page.get('title', '')
-            text = page.get('text') or ''
 
-            normalized_title = title.strip().upper()
+@metrics.stage("extract")
+def _process_page_file(input_jsonl, output_jsonl, famous_titles, stage_inputs, resume=True, strip_workers=None):
+    """Write residence sentences for every notable page in one JSONL file, resuming if interrupted."""
+    if resume and is_stage_current(output_jsonl, stage_inputs):
+        print(f"✔ {output_jsonl} is up to date; skipping extraction of {input_jsonl}.")
+        return
 
-            if normalized_title not in famous_titles:
-                continue
+    checkpoint = RecordCheckpoint(output_jsonl, stage_inputs)
+    done = checkpoint.resume(resume)
+    if done:
+        print(f"Resuming extraction of {input_jsonl} after {done} pages.")
+
+    if strip_workers is None:
+        strip_workers = STRIP_WORKERS
+    pending = []  # (title, sentences) waiting for a cross-article embedding batch
+    pending_sentences = 0
+    numbered_lines = _numbered_page_lines(input_jsonl, famous_titles, done)
+    with open(output_jsonl, 'a', encoding='utf-8') as outfile:
+        for line_no, title, sentences, full_count in _iter_split_pages(numbered_lines, famous_titles, strip_workers):
+            if full_count is not None:
+                _SECTION_STATS['articles'] += 1
+                _SECTION_STATS['kept'] += len(sentences)
+                _SECTION_STATS['full'] += full_count
+            pending.append((title, sentences))
+            pending_sentences += len(sentences)
+            if pending_sentences >= EMBED_POOL_SENTENCES:
+                _write_pending(pending, outfile)
+                pending_sentences = 0
+                checkpoint.update(outfile, line_no)
+
+        if pending:
+            _write_pending(pending, outfile)
+
+    checkpoint.complete()
+    _report_embedding_rate(input_jsonl)
+
+
+def process_pages(input_jsonl, output_jsonl, notable_csv, resume=True):
+    """Process JSONL wiki pages and extract residence sentences for notable people."""
+    famous_titles = load_famous_name_map(notable_csv)
+
+    # debug: print some sample names
+    _print_sample_titles(famous_titles)
+
+    stage_inputs = extract_stage_inputs([input_jsonl], notable_csv)
+    _process_page_file(input_jsonl, output_jsonl, famous_titles, stage_inputs, resume)
+
+
+def load_shard_manifest(manifest_path):
+    """Return the ordered shard paths listed in a manifest written by main.write_shard_manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('shards', [])
+
+
+def process_shards(manifest_path, output_jsonl, notable_csv, workers=None, resume=True):
+    """
+    Extract residence sentences from parsed shards in parallel, without concatenating them first.
+
+    Each shard is handled by its own worker process and writes a partial output; the partial
+    outputs (small, notable people only) are appended to output_jsonl in manifest order.
+    Finished partial outputs survive a crash and are skipped on the next run.
+    """
+    shard_paths = load_shard_manifest(manifest_path)
+    model_hash = classifier_hash()
+    stage_inputs = extract_stage_inputs(shard_paths, notable_csv, model_hash)
+    if resume and is_stage_current(output_jsonl, stage_inputs):
+        print(f"✔ {output_jsonl} is up to date; skipping extraction.")
+        return
+
+    famous_titles = load_famous_name_map(notable_csv)
+    _print_sample_titles(famous_titles)
+
+    if not shard_paths:
+        print(f"Warning: no shards listed in {manifest_path}; writing empty {output_jsonl}.")
+        open(output_jsonl, 'w', encoding='utf-8').close()
+        return
+
+    part_paths = [f"{output_jsonl}.part{idx:05d}" for idx in range(len(shard_paths))]
+    tasks = [
+        # Shard workers are daemonic pool processes and cannot own a strip pool, so strip inline
+        (shard, part, famous_titles, extract_stage_inputs([shard], notable_csv, model_hash), resume, 0)
+        for shard, part in zip(shard_paths, part_paths)
+    ]
+    workers = workers or min(len(shard_paths), os.cpu_count() or 1)
+    print(f"Extracting from {len(shard_paths)} shards with {workers} workers...")
+    pending = [task for task in tasks if not (resume and is_stage_current(task[1], task[3]))]
+    shared = bool(pending) and _can_share_model()
+    if shared:
+        # Load once and fork: the workers share the weights copy-on-write instead of each loading its own.
+        # Frozen objects are skipped by the collector, so the workers' GCs don't dirty those pages.
+        _load_model()
+        gc.freeze()
+    try:
+        with _process_context(shared).Pool(workers) as pool:
+            pool.starmap(_process_page_file, tasks)
+    finally:
+        if shared:
+            gc.unfreeze()
+
+    with open(output_jsonl, 'wb') as outfile:
+        for part in part_paths:
+            with open(part, 'rb') as infile:
+                shutil.copyfileobj(infile, outfile)
+            os.remove(part)
+            clear_stage(part)
 
-            residence_sentences = extract_residence_sentences(text)
-            output_record = {
-                'name': title,
-                'residence_sentences': residence_sentences,
-            }
-            outfile.write(json.dumps(output_record) + '\n')
+    mark_stage_complete(output_jsonl, stage_inputs)
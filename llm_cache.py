@@ -0,0 +1,118 @@
+# Content-addressed cache of raw LLM responses
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """sha256 over the canonical JSON of everything sent to the model (model, messages, options, format)."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite store of raw chat responses keyed by request_key.
+
+    With temperature 0 the same request yields the same answer, so cached responses can be
+    re-parsed and re-QC'd without calling the model. mode="refresh" ignores existing entries
+    but stores new responses; mode="bypass" neither reads nor writes. Least recently used
+    entries are evicted once the stored payloads exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 2 * 1024 ** 3, mode: str = "use") -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"cache mode must be one of {CACHE_MODES}, got {mode!r}")
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        if mode == "bypass":
+            return
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, payload TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response payload, or None on a miss (always None unless mode is 'use')."""
+        return self.get_any([key])
+
+    def get_any(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """Payload of the first of `keys` that is cached; one lookup for the hit/miss stats however many keys."""
+        if self._conn is None or self.mode != "use":
+            return None
+        for key in keys:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (int(time.time()), key))
+                self._conn.commit()
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, payload: Dict[str, Any]) -> None:
+        if self._conn is None:
+            return
+        text = json.dumps(payload, ensure_ascii=False)
+        now = int(time.time())
+        old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self._size -= old[0]
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, payload, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, text, len(text), now, now),
+        )
+        self.writes += 1
+        self._size += len(text)
+        if self._size > self.max_bytes:
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        # Drop least recently used rows until the cache is back under 90% of its cap
+        target = int(self.max_bytes * 0.9)
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self._size - freed <= target:
+                break
+            doomed.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._size -= freed
+        self.evicted += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evicted": self.evicted,
+            "bytes": self._size if self._conn is not None else 0,
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
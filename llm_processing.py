@@ -1,21 +1,101 @@
 # LLM processing script to normalize residence data
 from __future__ import annotations
 
+import argparse
 import asyncio
+import bisect
+import contextlib
+import itertools
 import json
 import os
 import re
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
 
-from ollama import Client
+import httpx
+
+import metrics
+from checkpoint import RecordCheckpoint, file_fingerprint, is_stage_current
+from concurrency_limit import AdaptiveLimiter
+from llm_cache import CACHE_MODES, LLMResponseCache, request_key
+from ollama_pool import RETRYABLE_ERRORS, ROUTING_POLICIES, EndpointPool, parse_endpoints
 
 LLM_PRIMARY_MODEL = os.getenv("LLM_PRIMARY_MODEL", "llama3.1:8b")
 # LLM_SECONDARY_MODEL = os.getenv("LLM_SECONDARY_MODEL", "o3-mini")
 # CONFIDENCE_THRESHOLD = int(os.getenv("LLM_CONFIDENCE_THRESHOLD", "75"))
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+# Several inference boxes: "http://gpu1:11434,http://gpu2:11434=other-model" (overrides OLLAMA_HOST)
+OLLAMA_HOSTS = os.getenv("OLLAMA_HOSTS", "")
+# How requests are spread over OLLAMA_HOSTS: "least-outstanding" or "latency"
+LLM_ROUTING = os.getenv("LLM_ROUTING", "least-outstanding")
+# Bump whenever _build_prompt or the chat options change so cached LLM output is regenerated
+PROMPT_VERSION = "1"
+# Bump whenever the JSON parsing / QC in _parse_residences changes; cached responses are re-scored offline
+QC_VERSION = "1"
+_CHAT_OPTIONS = {"temperature": 0}
+# Requests in flight at the start; the limit then adapts to latency and errors within [MIN, MAX].
+# Set MIN = MAX for a fixed limit (e.g. the server's OLLAMA_NUM_PARALLEL summed over hosts).
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "16"))
+# Seconds between progress lines with the current concurrency limit and throughput
+LLM_PROGRESS_INTERVAL = float(os.getenv("LLM_PROGRESS_INTERVAL", "30"))
+# How long Ollama keeps the model loaded after a request (duration string or seconds; -1 = forever)
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+# Deadline for one chat request, including queueing on the server; slower calls count as timeouts
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "300"))
+# Raw model responses keyed by request hash; "refresh" re-asks the model, "bypass" disables the cache
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_responses.sqlite")
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "2048"))
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "use")
+# Seconds between resume checkpoints (each one fsyncs the output); records finished since the last one
+# are redone after a crash, which costs nothing while their replies are in the response cache
+LLM_CHECKPOINT_SECONDS = float(os.getenv("LLM_CHECKPOINT_SECONDS", "2"))
+# Pack several people into one request up to this many (estimated) prompt tokens; 0 = one person per request.
+# Keep it well under the model's context (Ollama's num_ctx) since the reply grows with the pack.
+LLM_PACK_TOKENS = int(os.getenv("LLM_PACK_TOKENS", "0"))
+_PACK_MAX_PEOPLE = 16
+# Split a person's sentences into requests of at most this many estimated tokens, run concurrently and merged;
+# 0 = one request per person however long (chunking changes prompts, so cached replies are not reused)
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "0"))
+# Ask for schema-constrained JSON (Ollama `format`), cap num_predict by input size and stop at the closing bracket
+LLM_STRUCTURED = os.getenv("LLM_STRUCTURED", "1") != "0"
+LLM_MAX_PREDICT = int(os.getenv("LLM_MAX_PREDICT", "2048"))
+_SYSTEM_PROMPT = "You are a precise information extraction assistant."
 
-# Professor server init
-client = Client(host=OLLAMA_HOST)
+# Professor server init: one load-balanced pool of keep-alive clients, one per endpoint
+_pool: Optional[EndpointPool] = None
+# Caps model calls in flight across workers and chunk fan-out (see configure_concurrency)
+_inflight: Optional[AdaptiveLimiter] = None
+_LLM_STATS = {
+    "timeouts": 0,
+    "errors": 0,
+    "requests": 0,
+    "prompt_chars": 0,
+    "prompt_tokens": 0,
+    "pack_fallbacks": 0,
+    "model_calls": 0,
+    "output_tokens": 0,
+    "uncounted_calls": 0,
+    "estimated_output_tokens": 0,
+    "latency": 0.0,
+    "truncated": 0,
+    "parse_failures": 0,
+    "chunked_people": 0,
+    "chunks": 0,
+}
+# Seconds per model call, in completion order; only the most recent calls are kept for percentiles
+_LATENCIES: Deque[float] = deque(maxlen=10000)
+_REQUESTS = metrics.counter("pipeline_llm_requests_total", "Chat requests issued, including cache hits.")
+_CACHE_HITS = metrics.counter("pipeline_llm_cache_hits_total", "Chat requests answered from the response cache.")
+_FAILURES = metrics.counter("pipeline_llm_failures_total", "Chat requests that failed on every endpoint, by reason.")
+_QC_DROPPED = metrics.counter("pipeline_llm_qc_dropped_total", "Residence entries rejected by the regex/grounding QC.")
+_RESIDENCES = metrics.counter("pipeline_llm_residences_total", "Structured residences written.")
+_LLM_BYTES_OUT = metrics.counter("pipeline_llm_bytes_out_total", "Prompt bytes sent to the model (cache misses only).")
+_LLM_BYTES_IN = metrics.counter("pipeline_llm_bytes_in_total", "Reply bytes received from the model.")
+_REQUEST_SECONDS = metrics.histogram("pipeline_llm_request_seconds", "Seconds per model call (cache hits excluded).")
+_cache: Optional[LLMResponseCache] = None
 
 # Regexes for basic quality control
 _JSON_BLOCK_RE = re.compile(r"(\{.*\}|\[.*\])", re.DOTALL)
@@ -39,6 +119,15 @@ _NAME_TOKEN_RE = re.compile(r"[A-Za-z]{3,}")
 _PRONOUN_RE = re.compile(r"\b(he|his|she|her|they|their|them|him|family)\b", re.IGNORECASE)
 _CAP_NAME_RE = re.compile(r"\b[A-Z][a-z]+\b")
 _NON_WORD_RE = re.compile(r"\W+")
+_YEAR_RE = re.compile(r"\b\d{3,4}\b")
+
+# JSON schema for one person's reply: the list of objects _build_prompt asks for
+_RESIDENCE_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {key: {"type": "string"} for key in ("person", "residence", "time_span", "evidence")},
+    "required": ["person", "residence", "time_span", "evidence"],
+}
+_RESIDENCE_LIST_SCHEMA = {"type": "array", "items": _RESIDENCE_ITEM_SCHEMA}
 
 
 # Helper function to build the prompt for the LLM
@@ -56,6 +145,127 @@ def _build_prompt(person: str, sentences: List[str]) -> str:
     )
 
 
+def _person_block(person: str, sentences: List[str]) -> str:
+    evidence_block = "\n".join(f"- {s}" for s in sentences)
+    return f"Person: {person}\nSentences:\n{evidence_block}\n"
+
+
+def _build_packed_prompt(people: List[Tuple[str, List[str]]]) -> str:
+    """Same instructions as _build_prompt, stated once for several people, asking for a reply keyed by person."""
+    blocks = "\n".join(_person_block(person, sentences) for person, sentences in people)
+    return (
+        "You will receive biographical sentences about several people. "
+        "For each person, extract every distinct residence mentioned for that person, using only that person's sentences "
+        "(ignore locations tied to other people that don't include the person). "
+        "Respond ONLY with one valid JSON object whose keys are the person names exactly as given below; "
+        "each value is a list of objects with keys 'person', 'residence', 'time_span', and 'evidence' "
+        "(person must equal the key). Use an empty list for a person with no residences. "
+        "The 'evidence' must be a verbatim snippet from that person's sentences; if you cannot cite a snippet, omit the residence. "
+        "You must include a non-empty time_span; if you cannot find one, reasonably infer from context or omit the record. "
+        "time_span must be an exact year.\n"
+        f"{blocks}"
+    )
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; only used to size packs
+    return len(text) // 4 + 1
+
+
+def _chunk_sentences(person: str, sentences: List[str], budget: int) -> List[List[str]]:
+    """Split consecutive sentences into chunks whose person block stays within `budget` estimated tokens."""
+    if budget <= 0 or _estimate_tokens(_person_block(person, sentences)) <= budget:
+        return [sentences]
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    cost = _estimate_tokens(_person_block(person, []))
+    for sentence in sentences:
+        sentence_cost = _estimate_tokens(f"- {sentence}\n")
+        if current and cost + sentence_cost > budget:
+            chunks.append(current)
+            current, cost = [], _estimate_tokens(_person_block(person, []))
+        current.append(sentence)  # an oversized sentence still goes out, alone
+        cost += sentence_cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _year_range(time_span: str) -> Optional[Tuple[int, int]]:
+    years = [int(y) for y in _YEAR_RE.findall(time_span)]
+    return (min(years), max(years)) if years else None
+
+
+def _merge_residences(chunk_results: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """Merge per-chunk residences; the same place with overlapping year spans collapses into the first entry."""
+    merged: List[Dict[str, str]] = []
+    for entry in (e for result in chunk_results for e in result):
+        place = _normalize_text(entry["residence"])
+        span = _year_range(entry["time_span"])
+        for kept in merged:
+            if _normalize_text(kept["residence"]) != place:
+                continue
+            kept_span = _year_range(kept["time_span"])
+            if span is None or kept_span is None:
+                if _normalize_text(kept["time_span"]) == _normalize_text(entry["time_span"]):
+                    break
+                continue
+            if span[0] <= kept_span[1] and kept_span[0] <= span[1]:
+                low, high = min(span[0], kept_span[0]), max(span[1], kept_span[1])
+                if (low, high) != kept_span:
+                    kept["time_span"] = f"{low}-{high}"
+                break
+        else:
+            merged.append(dict(entry))
+    return merged
+
+
+def _packed_schema(people: List[Tuple[str, List[str]]]) -> Dict[str, object]:
+    names = [person for person, _ in people]
+    return {
+        "type": "object",
+        "properties": {name: _RESIDENCE_LIST_SCHEMA for name in names},
+        "required": names,
+    }
+
+
+def _predict_budget(people: List[Tuple[str, List[str]]]) -> int:
+    """num_predict cap: at most one entry per sentence, each about the sentence plus the name and JSON keys."""
+    budget = 32
+    for person, sentences in people:
+        budget += sum(_estimate_tokens(s) + _estimate_tokens(person) + 24 for s in sentences)
+    return min(budget, LLM_MAX_PREDICT)
+
+
+def _json_end_detector() -> Callable[[str], bool]:
+    """Return a predicate fed streamed chunks; it turns True once the top-level JSON value has closed."""
+    depth = 0
+    in_string = False
+    escaped = False
+
+    def feed(chunk: str) -> bool:
+        nonlocal depth, in_string, escaped
+        for ch in chunk:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "[{":
+                depth += 1
+            elif ch in "]}" and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    return True
+        return False
+
+    return feed
+
+
 def _extract_json_block(content: str) -> str:
     """Extract the first JSON-looking object/array from a longer response."""
     match = _JSON_BLOCK_RE.search(content)
@@ -94,8 +304,53 @@ def _normalize_text(text: str) -> str:
     return _NON_WORD_RE.sub(" ", text).strip().lower()
 
 
+class GroundingIndex:
+    """
+    One person's residence sentences, normalized once for evidence checks.
+
+    Holds the normalized sentences joined by newlines (normalized text never contains one, so a
+    substring hit cannot straddle two sentences) and an inverted index from token to the sentences
+    containing it. `locate` gives the same answer as comparing the evidence against every sentence,
+    at the cost of one substring search plus a walk over the evidence tokens' postings.
+    """
+
+    def __init__(self, sentences: List[str]) -> None:
+        self.norms = [_normalize_text(s) for s in sentences]
+        self._blob = "\n".join(self.norms)
+        self._starts = []
+        offset = 0
+        for norm in self.norms:
+            self._starts.append(offset)
+            offset += len(norm) + 1
+        self._postings: Dict[str, List[int]] = {}
+        for i, norm in enumerate(self.norms):
+            for token in set(norm.split()):
+                self._postings.setdefault(token, []).append(i)
+
+    def locate(self, evid_norm: str) -> Optional[int]:
+        """Index of the first sentence grounding the normalized evidence, or None."""
+        if not self.norms:
+            return None
+        pos = self._blob.find(evid_norm)
+        if pos >= 0:
+            return bisect.bisect_right(self._starts, pos) - 1
+
+        # Fallback: token overlap ≥ 60%, counting repeated evidence tokens each time
+        evid_tokens = [t for t in evid_norm.split() if len(t) > 2]
+        if not evid_tokens:
+            return None
+        needed = max(1, int(0.6 * len(evid_tokens)))
+        overlap: Dict[int, int] = {}
+        for token in set(evid_tokens):
+            weight = evid_tokens.count(token)
+            for i in self._postings.get(token, ()):
+                overlap[i] = overlap.get(i, 0) + weight
+        grounded = [i for i, count in overlap.items() if count >= needed]
+        return min(grounded) if grounded else None
+
+
 def _normalize_residence_entry(
-    item: Dict[str, str], person: str, sentences: List[str]
+    item: Dict[str, str], person: str, sentences: List[str], grounding: Optional[GroundingIndex] = None
 ) -> Optional[Dict[str, str]]:
     """Drop obviously bad entries and blank out suspect fields using regex-based checks."""
     place = str(item.get("residence", item.get("place", ""))).strip()
@@ -124,19 +379,9 @@ def _normalize_residence_entry(
     # Evidence must be grounded in the provided sentences (loose match)
     evid_norm = _normalize_text(evidence)
     if evidence and evid_norm:
-        sentence_norms = [_normalize_text(s) for s in sentences]
-        found_in_source = any(evid_norm in s for s in sentence_norms)
-        if not found_in_source:
-            # Fallback: token overlap ≥ 60%
-            evid_tokens = [t for t in evid_norm.split() if len(t) > 2]
-            for s in sentence_norms:
-                if not evid_tokens:
-                    break
-                overlap = sum(1 for t in evid_tokens if t in s.split())
-                if overlap >= max(1, int(0.6 * len(evid_tokens))):
-                    found_in_source = True
-                    break
-        if not found_in_source:
+        if grounding is None:
+            grounding = GroundingIndex(sentences)
+        if grounding.locate(evid_norm) is None:
             return None
 
     # Require evidence to loosely refer to the target: name match OR pronoun hint.
@@ -154,40 +399,141 @@ def _normalize_residence_entry(
     return {"person": person_val, "residence": place, "time_span": time_span, "evidence": evidence}
 
 
-# Asynchronous function to call the LLM API
-async def _call_llm(
-    person: str,
-    sentences: List[str],
+def _get_pool(
+    model_name: str = LLM_PRIMARY_MODEL,
+    hosts: Optional[str] = None,
+    routing: Optional[str] = None,
+    connections: Optional[int] = None,
+) -> EndpointPool:
+    """Return the endpoint pool; passing `hosts`, `routing` or `connections` rebuilds it (close the old one first)."""
+    global _pool
+    if _pool is None or hosts is not None or routing is not None or connections is not None:
+        _pool = EndpointPool(
+            parse_endpoints(hosts or OLLAMA_HOSTS or OLLAMA_HOST, model_name),
+            policy=routing or LLM_ROUTING,
+            connections=connections or max(LLM_CONCURRENCY, LLM_CONCURRENCY_MAX, 1) * 2,
+            timeout=LLM_REQUEST_TIMEOUT,
+            keep_alive=LLM_KEEP_ALIVE,
+        )
+    return _pool
+
+
+def configure_concurrency(
+    initial: Optional[int] = None, min_limit: Optional[int] = None, max_limit: Optional[int] = None
+) -> AdaptiveLimiter:
+    """Install the limiter that gates model calls; it must be created inside the event loop that uses it."""
+    global _inflight
+    initial = initial or LLM_CONCURRENCY
+    _inflight = AdaptiveLimiter(
+        initial,
+        min_limit=LLM_CONCURRENCY_MIN if min_limit is None else min_limit,
+        max_limit=max(initial, LLM_CONCURRENCY_MAX if max_limit is None else max_limit),
+    )
+    return _inflight
+
+
+async def close_pool() -> None:
+    """Close every endpoint's connections (call before the event loop shuts down)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+
+
+def _get_cache(mode: Optional[str] = None) -> LLMResponseCache:
+    """Open the response cache on first use; passing a different `mode` reopens it."""
+    global _cache
+    if _cache is not None and mode is not None and _cache.mode != mode:
+        close_cache()
+    if _cache is None:
+        _cache = LLMResponseCache(
+            LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024, mode=mode or LLM_CACHE_MODE
+        )
+    return _cache
+
+
+def close_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+async def _chat(
     model_name: str,
-) -> List[Dict[str, str]]:
-    if not sentences:
-        return []
+    messages: List[Dict[str, str]],
+    label: str,
+    schema: Optional[Dict[str, object]] = None,
+    num_predict: Optional[int] = None,
+) -> Optional[Dict[str, object]]:
+    """Answer one chat request from the cache or the endpoint pool; None if every endpoint failed."""
+    options = dict(_CHAT_OPTIONS, num_predict=num_predict) if num_predict else _CHAT_OPTIONS
+    request: Dict[str, object] = {"messages": messages, "options": options}
+    if schema is not None:
+        request["format"] = schema
+    _LLM_STATS["requests"] += 1
+    _LLM_STATS["prompt_chars"] += sum(len(m["content"]) for m in messages)
+    pool = _get_pool(model_name)
+    cache = _get_cache()
+    # A reply from any model in the pool is acceptable; it is cached under the model that produced it
+    _REQUESTS.inc()
+    payload = cache.get_any([request_key({"model": model, **request}) for model in pool.models])
+    if payload is not None:
+        _CACHE_HITS.inc()
+        return payload
+    _LLM_BYTES_OUT.inc(sum(len(m["content"].encode("utf-8")) for m in messages))
 
+    until = _json_end_detector if schema is not None else None
+    t0 = time.perf_counter()
     try:
-        response = await asyncio.to_thread(
-            lambda: client.chat(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a precise information extraction assistant.",
-                    },
-                    {
-                        "role": "user",
-                        "content": _build_prompt(person, sentences),
-                    },
-                ],
-                options={"temperature": 0},
-            )
-        )
-    except Exception:
-        return []
+        if _inflight is not None:
+            async with _inflight.slot():
+                t0 = time.perf_counter()
+                response, endpoint = await pool.chat(until=until, **request)
+        else:
+            response, endpoint = await pool.chat(until=until, **request)
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        _LLM_STATS["timeouts"] += 1
+        _FAILURES.inc(reason="timeout")
+        print(f"Warning: LLM request for {label!r} timed out after {LLM_REQUEST_TIMEOUT:.0f}s on every endpoint")
+        return None
+    except RETRYABLE_ERRORS as exc:
+        _LLM_STATS["errors"] += 1
+        _FAILURES.inc(reason="error")
+        print(f"Warning: LLM request for {label!r} failed on every endpoint: {type(exc).__name__}: {exc}")
+        return None
 
+    payload = {
+        "content": response["message"]["content"],
+        "prompt_eval_count": response.get("prompt_eval_count"),
+        "eval_count": response.get("eval_count"),
+        "estimated_eval_count": response.get("estimated_eval_count"),
+        "done_reason": response.get("done_reason"),
+    }
+    _LLM_STATS["model_calls"] += 1
+    _LLM_STATS["latency"] += time.perf_counter() - t0
+    _LATENCIES.append(time.perf_counter() - t0)
+    _REQUEST_SECONDS.observe(time.perf_counter() - t0)
+    _LLM_BYTES_IN.inc(len(payload["content"].encode("utf-8")))
+    if payload["eval_count"] is None:
+        _LLM_STATS["uncounted_calls"] += 1
+        _LLM_STATS["estimated_output_tokens"] += payload["estimated_eval_count"] or 0
+    else:
+        _LLM_STATS["prompt_tokens"] += payload["prompt_eval_count"] or 0
+        _LLM_STATS["output_tokens"] += payload["eval_count"]
+    if payload["done_reason"] == "length":
+        _LLM_STATS["truncated"] += 1
+    cache.put(request_key({"model": endpoint.model, **request}), endpoint.model, payload)
+    return payload
+
+
+def _parse_residences(content: str, person: str, sentences: List[str]) -> List[Dict[str, str]]:
+    """Turn a raw model reply into QC'd residence entries (pure, so cached replies can be re-scored)."""
     try:
-        content = response["message"]["content"]
         content = _extract_json_block(content)
         parsed = _clean_json_payload(content)
         if parsed is None:
+            _LLM_STATS["parse_failures"] += 1
             return []
         residences_payload = []
         if isinstance(parsed, dict):
@@ -200,42 +546,486 @@ async def _call_llm(
             residences_payload = parsed
         normalized = []
         if isinstance(residences_payload, list):
+            grounding = GroundingIndex(sentences)
             for item in residences_payload:
-                cleaned = _normalize_residence_entry(item, person, sentences)
+                cleaned = _normalize_residence_entry(item, person, sentences, grounding) if isinstance(item, dict) else None
                 if cleaned:
                     normalized.append(cleaned)
+                else:
+                    _QC_DROPPED.inc()
             return normalized
-    except (KeyError, ValueError, json.JSONDecodeError):
+    except (KeyError, ValueError, TypeError, AttributeError, json.JSONDecodeError):
         pass
     return []
 
+
+# Asynchronous function to call the LLM API
+async def _call_llm(
+    person: str,
+    sentences: List[str],
+    model_name: str,
+    chunk_tokens: Optional[int] = None,
+) -> Optional[List[Dict[str, str]]]:
+    """Residences for one person (None if a request failed); long sentence lists are chunked and merged."""
+    if not sentences:
+        return []
+    chunks = _chunk_sentences(person, sentences, LLM_CHUNK_TOKENS if chunk_tokens is None else chunk_tokens)
+    if len(chunks) == 1:
+        return await _call_llm_chunk(person, sentences, model_name)
+    _LLM_STATS["chunked_people"] += 1
+    _LLM_STATS["chunks"] += len(chunks)
+    results = await asyncio.gather(*(_call_llm_chunk(person, chunk, model_name) for chunk in chunks))
+    if any(result is None for result in results):
+        return None
+    return _merge_residences(list(results))
+
+
+async def _call_llm_chunk(person: str, sentences: List[str], model_name: str) -> Optional[List[Dict[str, str]]]:
+    """One request for one person's sentences; None if it failed."""
+    messages = [
+        {
+            "role": "system",
+            "content": _SYSTEM_PROMPT,
+        },
+        {
+            "role": "user",
+            "content": _build_prompt(person, sentences),
+        },
+    ]
+    if not LLM_STRUCTURED:
+        payload = await _chat(model_name, messages, person)
+    else:
+        budget = _predict_budget([(person, sentences)])
+        payload = await _chat(model_name, messages, person, _RESIDENCE_LIST_SCHEMA, budget)
+        if payload is not None and payload["done_reason"] == "length" and budget < LLM_MAX_PREDICT:
+            # The size estimate was too tight for this reply; retry once with the full cap
+            payload = await _chat(model_name, messages, person, _RESIDENCE_LIST_SCHEMA, LLM_MAX_PREDICT)
+    if payload is None:
+        return None
+    return _parse_residences(payload["content"], person, sentences)
+
+
+def _split_packed_reply(content: str, people: List[Tuple[str, List[str]]]) -> List[Optional[List[Dict[str, str]]]]:
+    """Split a packed reply into per-person QC'd residence lists; None for anyone the reply does not cover."""
+    parsed = _clean_json_payload(_extract_json_block(content))
+    if not isinstance(parsed, dict):
+        _LLM_STATS["parse_failures"] += 1
+        return [None] * len(people)
+    by_name = {_normalize_text(str(key)): value for key, value in parsed.items()}
+    results: List[Optional[List[Dict[str, str]]]] = []
+    for person, sentences in people:
+        items = parsed.get(person, by_name.get(_normalize_text(person)))
+        if not isinstance(items, list):
+            results.append(None)
+            continue
+        normalized = []
+        grounding = GroundingIndex(sentences)
+        for item in items:
+            # Bare strings and other non-objects carry no residence fields; drop them like a failed QC check
+            cleaned = _normalize_residence_entry(item, person, sentences, grounding) if isinstance(item, dict) else None
+            if cleaned:
+                normalized.append(cleaned)
+            else:
+                _QC_DROPPED.inc()
+        results.append(normalized)
+    return results
+
+
+async def _call_llm_packed(
+    people: List[Tuple[str, List[str]]],
+    model_name: str,
+    chunk_tokens: Optional[int] = None,
+) -> List[Optional[List[Dict[str, str]]]]:
+    """One request for several people; anyone missing from the reply falls back to a single-person call."""
+    if len(people) == 1:
+        return [await _call_llm(people[0][0], people[0][1], model_name, chunk_tokens)]
+
+    payload = await _chat(
+        model_name,
+        [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": _build_packed_prompt(people)},
+        ],
+        f"{people[0][0]} +{len(people) - 1} packed",
+        _packed_schema(people) if LLM_STRUCTURED else None,
+        _predict_budget(people) if LLM_STRUCTURED else None,
+    )
+    if payload is None:
+        split: List[Optional[List[Dict[str, str]]]] = [None] * len(people)
+    else:
+        split = _split_packed_reply(payload["content"], people)
+
+    results: List[Optional[List[Dict[str, str]]]] = []
+    for (person, sentences), residences in zip(people, split):
+        if residences is None:
+            _LLM_STATS["pack_fallbacks"] += 1
+            residences = await _call_llm(person, sentences, model_name, chunk_tokens)
+        results.append(residences)
+    return results
+
+
+def llm_stage_inputs(
+    input_jsonl: str, model_name: str, pack_tokens: int = 0, chunk_tokens: int = 0
+) -> Dict[str, object]:
+    """Inputs recorded in the LLM-stage manifest."""
+    return {
+        "stage": "llm",
+        "input": {input_jsonl: file_fingerprint(input_jsonl)},
+        "model": model_name,
+        "prompt_version": PROMPT_VERSION,
+        "qc_version": QC_VERSION,
+        "options": _CHAT_OPTIONS,
+        "pack_tokens": pack_tokens,
+        "chunk_tokens": chunk_tokens,
+        "structured": LLM_STRUCTURED,
+    }
+
+
 # Main processing function
 async def process_with_llm(
     input_jsonl: str = "llm_output_residences.jsonl",
     output_jsonl: str = "structured_residences.jsonl",
+    resume: bool = True,
+    concurrency: Optional[int] = None,
+    cache_mode: Optional[str] = None,
+    pack_tokens: Optional[int] = None,
+    hosts: Optional[str] = None,
+    routing: Optional[str] = None,
+    chunk_tokens: Optional[int] = None,
+    min_concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    records: Optional[AsyncIterator[Dict[str, object]]] = None,
 ) -> None:
-    with open(input_jsonl, "r", encoding="utf-8") as infile, open(
-        output_jsonl, "w", encoding="utf-8"
-    ) as outfile:
-        for line in infile:
-            record = json.loads(line)
+    """Run the LLM step over extractor records with concurrent workers, writing results in input order."""
+    global _inflight
+    pack_tokens = LLM_PACK_TOKENS if pack_tokens is None else pack_tokens
+    chunk_tokens = LLM_CHUNK_TOKENS if chunk_tokens is None else chunk_tokens
+    concurrency = max(1, concurrency or LLM_CONCURRENCY)
+    max_concurrency = max(concurrency, LLM_CONCURRENCY_MAX if max_concurrency is None else max_concurrency)
+    pool = _get_pool(LLM_PRIMARY_MODEL, hosts, routing, connections=max_concurrency * 2)
+    models = ",".join(pool.models)
+    checkpoint: Optional[RecordCheckpoint] = None
+    done = 0
+    # Streamed `records` (see streaming.py) are written in arrival order, without manifest or checkpoint
+    if records is None:
+        stage_inputs = llm_stage_inputs(input_jsonl, models, pack_tokens, chunk_tokens)
+        if resume and is_stage_current(output_jsonl, stage_inputs):
+            print(f"✔ {output_jsonl} is up to date for model {models}; skipping LLM calls.")
+            return
+        checkpoint = RecordCheckpoint(output_jsonl, stage_inputs, interval=LLM_CHECKPOINT_SECONDS)
+        done = checkpoint.resume(resume)
+        if done:
+            retry_note = f", retrying {len(checkpoint.failed)} failed ones" if checkpoint.failed else ""
+            print(f"Resuming LLM processing of {input_jsonl} after {done} records{retry_note}.")
+    retry = set(checkpoint.failed) if checkpoint is not None else set()
+    failed = set(retry)  # records whose requests failed; not written, redone by the next run
+
+    _get_cache(cache_mode)
+
+    limiter = configure_concurrency(concurrency, min_concurrency, max_concurrency)
+    workers = limiter.max_limit  # idle workers cost nothing; the limiter decides how many may call the model
+    # Records read but not yet written; with packing each request holds a whole pack of them
+    window = asyncio.Semaphore(workers * (_PACK_MAX_PEOPLE * 2 if pack_tokens > 0 else 4))
+    jobs: asyncio.Queue = asyncio.Queue(maxsize=workers)
+    finished: Dict[int, Optional[List[Dict[str, str]]]] = {}
+    order: Deque[int] = deque()  # line numbers read but not yet written, in input order
+    ready = asyncio.Condition()
+    last_line: List[Optional[int]] = [None]  # set once the reader reaches EOF
+    stats = {"records": 0, "last_line": done, "unpacked_chars": 0, "first_write": None}
+    llm_before = dict(_LLM_STATS)
+    writer_done = asyncio.Event()
+    pack_overhead = _estimate_tokens(_SYSTEM_PROMPT + _build_packed_prompt([]))
+    t0 = time.perf_counter()
+
+    async def numbered_lines(infile):
+        for line_no, line in enumerate(infile, 1):
+            if line_no > done or line_no in retry:
+                yield line_no, json.loads(line)
+
+    async def numbered_records():
+        line_no = 0
+        async for record in records:
+            line_no += 1
+            yield line_no, record
+
+    async def read_input(source) -> None:
+        pack: List[Tuple[int, str, List[str]]] = []
+        pack_cost = pack_overhead
+        line_no = done
+        async for line_no, record in source:
+            if pack and window.locked():
+                # Don't sit on a part-filled pack while waiting for the writer to free the window
+                await jobs.put(pack)
+                pack, pack_cost = [], pack_overhead
+            await window.acquire()
+            order.append(line_no)
             person = record.get("name") or record.get("title") or ""
             sentences = record.get("residence_sentences", [])
-            if not sentences or sentences[0] == "":
-                # No residence sentences found
-                continue
+            cost = _estimate_tokens(_person_block(person, sentences)) if sentences else 0
+            oversized = 0 < chunk_tokens < cost  # long sentence lists are chunked on their own, never packed
+            if pack and (
+                oversized
+                or pack_cost + cost > pack_tokens
+                or len(pack) >= _PACK_MAX_PEOPLE
+                or any(person == packed[1] for packed in pack)
+            ):
+                await jobs.put(pack)
+                pack, pack_cost = [], pack_overhead
+            pack.append((line_no, person, sentences))
+            pack_cost += cost
+            if oversized:
+                await jobs.put(pack)
+                pack, pack_cost = [], pack_overhead
+        if pack:
+            await jobs.put(pack)
+        for _ in range(workers):
+            await jobs.put(None)
+        async with ready:
+            last_line[0] = line_no
+            ready.notify_all()
 
-            structured_residences = await _call_llm(person, sentences, LLM_PRIMARY_MODEL)
+    async def work() -> None:
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            results: Dict[int, Optional[List[Dict[str, str]]]] = {}
+            todo = []
+            for line_no, person, sentences in job:
+                if not sentences or sentences[0] == "":
+                    # No residence sentences found
+                    results[line_no] = []
+                else:
+                    todo.append((line_no, person, sentences))
+                    stats["unpacked_chars"] += len(_SYSTEM_PROMPT) + len(_build_prompt(person, sentences))
+            if todo:
+                packed = await _call_llm_packed(
+                    [(person, sentences) for _, person, sentences in todo], LLM_PRIMARY_MODEL, chunk_tokens
+                )
+                results.update(zip((line_no for line_no, _, _ in todo), packed))
+            async with ready:
+                finished.update(results)
+                ready.notify_all()
 
-            if not structured_residences:
-                continue
+    async def write_output(outfile) -> None:
+        while True:
+            async with ready:
+                await ready.wait_for(
+                    lambda: (order and order[0] in finished) or (last_line[0] is not None and not order)
+                )
+                if not order:
+                    return
+                line_no = order.popleft()
+                residences = finished.pop(line_no)
+            if residences is None:
+                failed.add(line_no)
+            else:
+                failed.discard(line_no)
+                for residence in residences:
+                    outfile.write(json.dumps(residence) + "\n")
+                _RESIDENCES.inc(len(residences))
+            stats["last_line"] = max(stats["last_line"], line_no)
+            if checkpoint is not None:
+                checkpoint.update(outfile, stats["last_line"], failed=failed)
+            else:
+                outfile.flush()
+            if stats["first_write"] is None:
+                stats["first_write"] = time.perf_counter() - t0
+            stats["records"] += 1
+            window.release()
+
+    async def report_progress() -> None:
+        # Log the limiter's choice and recent throughput until the writer is done
+        last_t, last_records = t0, stats["records"]
+        while True:
+            try:
+                await asyncio.wait_for(writer_done.wait(), LLM_PROGRESS_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            now = time.perf_counter()
+            recent = list(itertools.islice(reversed(_LATENCIES), max(limiter.current * 4, 8)))
+            print(
+                f"[llm {now - t0:7.0f}s] concurrency limit {limiter.current} ({limiter.in_flight} in flight), "
+                f"{(stats['records'] - last_records) / (now - last_t):.2f} records/s, "
+                f"{stats['records']} records done, "
+                f"recent latency p50 {sorted(recent)[len(recent) // 2] if recent else 0.0:.2f}s"
+            )
+            last_t, last_records = now, stats["records"]
 
-            for residence in structured_residences:
-                outfile.write(json.dumps(residence) + "\n")
+    async def write_and_signal(outfile) -> None:
+        try:
+            await write_output(outfile)
+        finally:
+            writer_done.set()
+
+    with contextlib.ExitStack() as files:
+        if records is None:
+            source = numbered_lines(files.enter_context(open(input_jsonl, "r", encoding="utf-8")))
+        else:
+            source = numbered_records()
+        outfile = files.enter_context(open(output_jsonl, "a" if records is None else "w", encoding="utf-8"))
+        tasks = [
+            asyncio.create_task(read_input(source)),
+            asyncio.create_task(write_and_signal(outfile)),
+            asyncio.create_task(report_progress()),
+        ] + [asyncio.create_task(work()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # gather leaves the other tasks running when one fails; stop them before closing the pool
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            host_report = pool.report()
+            await close_pool()
+            _inflight = None
+            cache_stats = _get_cache().stats()
+            close_cache()
+        if checkpoint is not None and failed:
+            checkpoint.update(outfile, stats["last_line"], force=True, failed=failed)
+
+    if failed:
+        print(f"Warning: {len(failed)} records failed and were not written; rerun to retry them.")
+    elif checkpoint is not None:
+        checkpoint.complete()
+    elapsed = time.perf_counter() - t0
+    run = {name: _LLM_STATS[name] - llm_before[name] for name in _LLM_STATS}
+    print(
+        f"LLM stage: {run['requests']} requests for {stats['records']} records in {elapsed:.2f}s "
+        f"({stats['records'] / max(elapsed, 1e-9):.2f} records/s); "
+        f"{run['timeouts']} timeouts, {run['errors']} failed requests"
+    )
+    if stats["first_write"] is not None:
+        print(f"First structured record written {stats['first_write']:.1f}s after the stage started")
+    limits = [concurrency] + [limit for _, limit in limiter.history]
+    if limiter.adaptive:
+        print(
+            f"Concurrency: started at {concurrency}, ended at {limiter.current}, ranged {min(limits)}-{max(limits)} "
+            f"(bounds {limiter.min_limit}-{limiter.max_limit}, {len(limiter.history)} adjustments)"
+        )
+    else:
+        print(f"Concurrency: fixed at {limiter.current}")
+    if pack_tokens > 0:
+        sent, unpacked = run["prompt_chars"] // 4, stats["unpacked_chars"] // 4
+        print(
+            f"Packing (budget {pack_tokens} tokens): ~{sent} prompt tokens sent vs ~{unpacked} unpacked "
+            f"({1 - sent / max(unpacked, 1):.1%} saved), {run['pack_fallbacks']} single-person fallbacks"
+        )
+    if len(host_report) > 1:
+        for host in host_report:
+            print(
+                f"  {host['host']} ({host['model']}): {host['completed']} requests, "
+                f"{host['requests_per_s']:.2f} req/s, {host['latency_ewma_s']:.2f}s latency, "
+                f"{host['failures']} failures, ejected {host['ejections']}x"
+            )
+    if run["model_calls"]:
+        counted = run["model_calls"] - run["uncounted_calls"]
+        print(
+            f"Model calls ({'schema-constrained' if LLM_STRUCTURED else 'free text'}, cache hits not included): "
+            f"{run['model_calls']} calls, {run['latency'] / run['model_calls']:.2f}s mean latency, "
+            f"{run['truncated']} hit num_predict"
+        )
+        if counted:
+            print(
+                f"Server-reported tokens ({counted} calls): {run['prompt_tokens']} prompt, "
+                f"{run['output_tokens']} output ({run['output_tokens'] / counted:.1f}/call)"
+            )
+        if run["uncounted_calls"]:
+            # Stopped once the JSON closed, before the server's final frame with the counts
+            print(
+                f"Stopped early ({run['uncounted_calls']} calls, no server counts): "
+                f"~{run['estimated_output_tokens']} output tokens estimated from streamed chunks"
+            )
+        latencies = sorted(list(_LATENCIES)[-run["model_calls"]:])  # this run, up to the window size
+        print(
+            f"Request latency: p50 {latencies[len(latencies) // 2]:.2f}s, "
+            f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.2f}s, max {latencies[-1]:.2f}s"
+        )
+    if run["chunked_people"]:
+        print(
+            f"Chunking (budget {chunk_tokens} tokens): {run['chunked_people']} people split into "
+            f"{run['chunks']} concurrent requests"
+        )
+    print(f"Unparseable replies: {run['parse_failures']}")
+    if cache_stats["mode"] != "bypass":
+        print(
+            f"LLM response cache ({cache_stats['mode']}): {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.1%}), {cache_stats['writes']} stored, {cache_stats['evicted']} evicted, "
+            f"{cache_stats['bytes'] / 1e6:.1f} MB on disk"
+        )
 
 
 def main():
-    asyncio.run(process_with_llm())
+    parser = argparse.ArgumentParser(description="Normalize residence sentences into structured records with the LLM.")
+    parser.add_argument("--input", default="llm_output_residences.jsonl", help="Input JSONL with residence_sentences.")
+    parser.add_argument("--output", default="structured_residences.jsonl", help="Output JSONL for structured residences.")
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Ignore the stage manifest and any partial progress; reprocess every record.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=LLM_CONCURRENCY,
+        help="Initial concurrent requests to the LLM server (default: LLM_CONCURRENCY or 4).",
+    )
+    parser.add_argument(
+        "--min-concurrency",
+        type=int,
+        default=None,
+        help="Lower bound for the adaptive concurrency limit (default: LLM_CONCURRENCY_MIN or 1).",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=None,
+        help="Upper bound for the adaptive concurrency limit; equal bounds fix it (default: LLM_CONCURRENCY_MAX or 16).",
+    )
+    parser.add_argument(
+        "--cache",
+        choices=CACHE_MODES,
+        default=LLM_CACHE_MODE,
+        help=(
+            "Response cache mode: use cached replies, refresh them from the model, or bypass the cache "
+            "(default: LLM_CACHE_MODE or use). Combine refresh with --no-resume to redo a finished stage."
+        ),
+    )
+    parser.add_argument(
+        "--pack-tokens",
+        type=int,
+        default=LLM_PACK_TOKENS,
+        help="Pack several people per request up to this many estimated prompt tokens (default: LLM_PACK_TOKENS or 0 = off).",
+    )
+    parser.add_argument(
+        "--hosts",
+        default=None,
+        help="Comma-separated Ollama endpoints, each optionally '=model' (default: OLLAMA_HOSTS or OLLAMA_HOST).",
+    )
+    parser.add_argument(
+        "--routing",
+        choices=ROUTING_POLICIES,
+        default=None,
+        help="How requests are spread over the endpoints (default: LLM_ROUTING or least-outstanding).",
+    )
+    args = parser.parse_args()
+    metrics.start()
+    with metrics.stage("llm"):
+        asyncio.run(
+            process_with_llm(
+                args.input,
+                args.output,
+                resume=not args.no_resume,
+                concurrency=args.concurrency,
+                cache_mode=args.cache,
+                pack_tokens=args.pack_tokens,
+                hosts=args.hosts,
+                routing=args.routing,
+                min_concurrency=args.min_concurrency,
+                max_concurrency=args.max_concurrency,
+            )
+        )
 
 
 if __name__ == "__main__":
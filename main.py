@@ -1,15 +1,52 @@
 # Main orchestration script to process Wikipedia dump and extract structured residence data
+import argparse
+import json
 import os
+import shutil
 import time
 import subprocess
 import multiprocessing
 from pathlib import Path
 
-from extractor import process_pages
-from parser import parse_wiki_dump
+import metrics
+from checkpoint import clear_stage, file_fingerprint, file_sha256, is_stage_current, mark_stage_complete
+from extractor import load_famous_name_map, process_pages, process_shards
+from parser import find_namespace, merge_title_indexes, parse_wiki_dump, split_dump
+from streaming import run_streaming
 
-_MODEL_PATH = Path(__file__).resolve().parent / "residence_classifier.joblib"
+_MODEL_DIR = Path(__file__).resolve().parent / "residence_classifier"
+_LEGACY_MODEL_PATH = Path(__file__).resolve().parent / "residence_classifier.joblib"
 _TRAIN_DATA_PATH = Path("train_data.jsonl")
+_NOTABLE_CSV_PATH = Path("notable_humans/result.csv")
+_COPY_CHUNK = 16 * 1024 * 1024  # 16MB per copy call keeps memory constant for any shard size
+
+
+def _copy_file_contents(infile, outfile):
+    """Append infile to outfile without loading it into memory, using a kernel-side copy when possible."""
+    size = os.fstat(infile.fileno()).st_size
+    outfile.flush()
+    copied = 0
+    try:
+        # copy_file_range/sendfile move the bytes inside the kernel, never through Python buffers
+        if hasattr(os, "copy_file_range"):
+            while copied < size:
+                n = os.copy_file_range(infile.fileno(), outfile.fileno(), min(_COPY_CHUNK, size - copied))
+                if n == 0:
+                    break
+                copied += n
+        elif hasattr(os, "sendfile"):
+            while copied < size:
+                n = os.sendfile(outfile.fileno(), infile.fileno(), copied, min(_COPY_CHUNK, size - copied))
+                if n == 0:
+                    break
+                copied += n
+    except OSError:
+        pass  # unsupported filesystem/kernel; finish with the chunked copy below
+
+    # Resync the Python file objects with the kernel offsets, then copy whatever is left in chunks
+    infile.seek(copied)
+    outfile.seek(0, os.SEEK_END)
+    shutil.copyfileobj(infile, outfile, _COPY_CHUNK)
 
 
 def combine_files(source_files, destination_file):
@@ -19,22 +56,59 @@ def combine_files(source_files, destination_file):
     with open(destination_file, "wb") as outfile:
         for filepath in source_files:
             with open(filepath, "rb") as infile:
-                outfile.write(infile.read())
+                _copy_file_contents(infile, outfile)
 
             os.remove(filepath)  # remove the partial file after it has been merged
+            clear_stage(filepath)
+
+
+def write_shard_manifest(shard_files, manifest_path):
+    """Record the ordered list of parsed shards so extraction can read them without concatenation."""
+    manifest_path = Path(manifest_path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"shards": [str(Path(p).resolve()) for p in shard_files]}, f, indent=2)
+    print(f"\nWrote manifest of {len(shard_files)} shards to {manifest_path}")
+
+
+def _parse_shard(task, shard_inputs):
+    """Pool worker: parse one byte range, then record it as complete so a rerun can skip it."""
+    with metrics.stage("parse"):
+        parse_wiki_dump(*task)
+    mark_stage_complete(task[1], shard_inputs)
+
+
+def stream_pipeline(dump_paths, allowed_titles, num_workers, extracted_jsonl, structured_jsonl):
+    """Run parse, extraction and the LLM step concurrently (see streaming.run_streaming)."""
+    tasks = []
+    for dump_path in dump_paths:
+        try:
+            ns_uri = find_namespace(dump_path)
+        except ValueError as e:
+            print(f"Error: {e} Skipping {dump_path}.")
+            continue
+        ranges = split_dump(str(dump_path), num_workers)
+        print(f"{dump_path.name}: split into {len(ranges)} byte range(s).")
+        tasks.extend((str(dump_path), start, end, ns_uri) for start, end in ranges)
+    if not tasks:
+        print("Error: no parsable dumps to stream.")
+        raise SystemExit(1)
+
+    ensure_model()
+    run_streaming(tasks, allowed_titles, str(structured_jsonl), extracted_jsonl and str(extracted_jsonl))
 
 
 def ensure_model():
-    """Train the classifier if the joblib artifact is missing."""
-    if _MODEL_PATH.exists():
-        print(f"✔ Using existing classifier at {_MODEL_PATH}")
-        return
+    """Train the classifier if no artifact (nor an older pickled one) exists."""
+    for path in (_MODEL_DIR, _LEGACY_MODEL_PATH):
+        if path.exists():
+            print(f"✔ Using existing classifier at {path}")
+            return
 
     if not _TRAIN_DATA_PATH.exists():
         print(f"Error: training data not found at {_TRAIN_DATA_PATH}; cannot train classifier.")
         raise SystemExit(1)
 
-    print(f"Training classifier -> {_MODEL_PATH} ...")
+    print(f"Training classifier -> {_MODEL_DIR} ...")
     try:
         subprocess.run(["python3", "train_classifier.py"], check=True)
     except subprocess.CalledProcessError as exc:
@@ -43,9 +117,37 @@ def ensure_model():
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse dumps, extract residence sentences and run the LLM step.")
+    arg_parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Keep the parsed shards and extract from them in parallel instead of combining them into one file.",
+    )
+    arg_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore stage manifests and partial progress; rerun every stage from scratch.",
+    )
+    arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Run parsing, extraction and the LLM step at the same time over in-memory queues instead of "
+            "stage by stage. Nothing is resumable in this mode; cached LLM replies are still reused."
+        ),
+    )
+    arg_parser.add_argument(
+        "--keep-intermediates",
+        action="store_true",
+        help="With --stream, also write the extracted residence sentences to classifier_output_residences.jsonl.",
+    )
+    args = arg_parser.parse_args()
+    metrics.start()
+
     start_time = time.time()
 
     final_parsed_jsonl = Path("wiki_articles.jsonl")
+    shard_manifest = Path("wiki_articles.manifest.json")
     extracted_jsonl = Path("classifier_output_residences.jsonl")
     structured_jsonl = Path("structured_residences.jsonl")
 
@@ -55,38 +157,103 @@ if __name__ == "__main__":
     temp_output_dir = Path("./temp_parsed_output")  # temporary directory for the output of each process
     temp_output_dir.mkdir(exist_ok=True)
 
-    # Find all .bz2 files in the input directory
-    dump_paths = list(input_dir.glob("*.bz2"))
+    # Find all .bz2 dump files in the input directory (multistream index files sit next to them)
+    dump_paths = sorted(p for p in input_dir.glob("*.bz2") if not p.name.endswith("-index.txt.bz2"))
     if not dump_paths:
         print(f"Error: No .bz2 files found in the directory '{input_dir}'.")
         raise SystemExit(1)
 
     print(f"Found {len(dump_paths)} dump files to process.")
 
-    # Create a list of (input_path, unique_output_path) tuples
-    tasks = []
-    for dump_path in dump_paths:
-        # Create a unique name for the output file based on the input file's name
-        # e.g., 'wiki-dump1.bz2' -> 'temp_parsed_output/wiki-dump1.xml.jsonl'
-        output_path = temp_output_dir / f"{dump_path.stem}.jsonl"
-        tasks.append((str(dump_path), str(output_path)))
-
-    # --- RUN PARSING IN PARALLEL ---
-    # Use a process pool to execute parse_wiki_dump for each task
-    # It automatically uses the number of available CPU cores
-    print(f"Starting parallel parsing with {multiprocessing.cpu_count()} cores...")
-    with multiprocessing.Pool() as pool:
-        pool.starmap(parse_wiki_dump, tasks)
-
-    print("\nAll individual dump files have been parsed.")
-
-    # --- COMBINE RESULTS ---
-    # Get the list of all temporary files created by the processes
-    temp_files = sorted(list(temp_output_dir.glob("*.jsonl")))
-    if temp_files:
-        combine_files(temp_files, final_parsed_jsonl)
+    # Create a list of (input_path, unique_output_path, start, end, namespace, titles) tuples.
+    # Each dump is cut into byte ranges on bz2 stream boundaries so a single large
+    # multistream dump is still parsed by every core.
+    num_workers = multiprocessing.cpu_count()
+
+    # Only notable people survive extraction, so drop every other page inside the parser
+    # instead of writing it to the intermediate JSONL.
+    allowed_titles = None
+    notable_hash = None
+    if _NOTABLE_CSV_PATH.exists():
+        allowed_titles = frozenset(load_famous_name_map(_NOTABLE_CSV_PATH))
+        notable_hash = file_sha256(_NOTABLE_CSV_PATH)
+        print(f"Filtering parsed pages to {len(allowed_titles)} notable titles from {_NOTABLE_CSV_PATH}.")
     else:
-        print("Warning: No temporary files were created. The final output will be empty.")
+        print(f"Warning: {_NOTABLE_CSV_PATH} not found; parsing every article.")
+
+    if args.stream:
+        if allowed_titles is None:
+            print(f"Error: --stream needs {_NOTABLE_CSV_PATH} to pick the articles to extract.")
+            raise SystemExit(1)
+        # Leave one core for the embedding worker; this process only waits on the LLM
+        stream_pipeline(
+            dump_paths,
+            allowed_titles,
+            max(1, num_workers - 1),
+            extracted_jsonl if args.keep_intermediates else None,
+            structured_jsonl,
+        )
+        print(f"✔ Streaming pipeline finished in {time.time() - start_time:.2f} seconds (output: {structured_jsonl}).")
+        raise SystemExit(0)
+
+    # The parse stage is reused when neither the dumps nor the notable list changed since the last run
+    parse_output = shard_manifest if args.sharded else final_parsed_jsonl
+    parse_inputs = {
+        "stage": "parse",
+        "dumps": {str(p): file_fingerprint(p) for p in dump_paths},
+        "notable_csv_sha256": notable_hash,
+        "sharded": args.sharded,
+    }
+    if not args.force and is_stage_current(parse_output, parse_inputs):
+        print(f"✔ {parse_output} is up to date; skipping parsing.")
+    else:
+        tasks = []
+        pending = []
+        for dump_path in dump_paths:
+            try:
+                ns_uri = find_namespace(dump_path)
+            except ValueError as e:
+                print(f"Error: {e} Skipping {dump_path}.")
+                continue
+
+            ranges = split_dump(str(dump_path), num_workers)
+            print(f"{dump_path.name}: split into {len(ranges)} byte range(s).")
+            for idx, (start, end) in enumerate(ranges):
+                # Create a unique name for the output file based on the input file's name and range
+                # e.g., 'wiki-dump1.xml.bz2' -> 'temp_parsed_output/wiki-dump1.xml.00000.jsonl'
+                output_path = temp_output_dir / f"{dump_path.stem}.{idx:05d}.jsonl"
+                task = (str(dump_path), str(output_path), start, end, ns_uri, allowed_titles)
+                tasks.append(task)
+                shard_inputs = {
+                    "stage": "parse-shard",
+                    "dump": {str(dump_path): file_fingerprint(dump_path)},
+                    "range": [start, end],
+                    "notable_csv_sha256": notable_hash,
+                }
+                # Shards finished by an earlier (possibly crashed) run are not parsed again
+                if args.force or not is_stage_current(output_path, shard_inputs):
+                    pending.append((task, shard_inputs))
+
+        # --- RUN PARSING IN PARALLEL ---
+        # Use a process pool to execute parse_wiki_dump for each byte range
+        print(f"Starting parallel parsing of {len(pending)}/{len(tasks)} ranges with {num_workers} cores...")
+        with multiprocessing.Pool(num_workers) as pool:
+            pool.starmap(_parse_shard, pending)
+
+        print("\nAll individual dump files have been parsed.")
+
+        # --- COMBINE RESULTS ---
+        # Get the list of temporary files created by this run, in dump/range order
+        temp_files = [Path(task[1]) for task in tasks if Path(task[1]).exists()]
+        if not temp_files:
+            print("Warning: No temporary files were created. The final output will be empty.")
+        if args.sharded:
+            write_shard_manifest(temp_files, shard_manifest)
+        else:
+            # Rebase the per-shard title indexes onto the combined file before the shards are removed
+            merge_title_indexes(temp_files, final_parsed_jsonl)
+            combine_files(temp_files, final_parsed_jsonl)
+        mark_stage_complete(parse_output, parse_inputs)
 
     parsing_end_time = time.time()
     print(f"✔ Total parsing and combining finished in {parsing_end_time - start_time:.2f} seconds.")
@@ -95,13 +262,18 @@ if __name__ == "__main__":
     ensure_model()
 
     # --- 5. EXTRACT IMPORTANT DATA ---
-    # NOTE: hardcoded path to the notable humans CSV
-    process_pages(str(final_parsed_jsonl), str(extracted_jsonl), "notable_humans/result.csv")
+    if args.sharded:
+        process_shards(str(shard_manifest), str(extracted_jsonl), str(_NOTABLE_CSV_PATH), resume=not args.force)
+    else:
+        process_pages(str(final_parsed_jsonl), str(extracted_jsonl), str(_NOTABLE_CSV_PATH), resume=not args.force)
 
     # --- 6. LLM USAGE ---
     llm_start_time = time.time()
     try:
-        subprocess.run(["python3", "llm_processing.py"], check=True)
+        llm_cmd = ["python3", "llm_processing.py", "--input", str(extracted_jsonl), "--output", str(structured_jsonl)]
+        if args.force:
+            llm_cmd.append("--no-resume")
+        subprocess.run(llm_cmd, check=True)
     finally:
         elapsed = time.time() - llm_start_time
         print(f"✔ LLM post-processing finished in {elapsed:.2f} seconds (output: {structured_jsonl}).")
@@ -0,0 +1,282 @@
+# Process-wide counters and timing histograms for the pipeline stages, with periodic export and opt-in profiling
+import atexit
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Export target: "*.prom" writes the Prometheus textfile format, any other name JSON; empty disables export
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))  # seconds between exports
+# Stages to run under cProfile ("parse,extract,llm" or "all"); PROFILE_MEMORY=1 adds a tracemalloc report
+PROFILE_STAGES = {s.strip() for s in os.getenv("PROFILE_STAGES", "").split(",") if s.strip()}
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "0") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+
+_DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+# Set by the process that owns METRICS_PATH; worker processes and subprocesses inherit it and
+# write their own snapshots to <METRICS_PATH>.parts/<pid>.json, which the owner folds in on export.
+_OWNER_ENV = "PIPELINE_METRICS_OWNER"
+_METRICS = {}
+_lock = threading.Lock()
+_exporter = None  # (pid, thread) of the running export loop
+
+
+def _key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}  # label tuple -> total
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def _series(self):
+        return [{"labels": dict(key), "value": value} for key, value in dict(self.values).items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=_DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # label tuple -> [count per bucket..., overflow, sum]
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _series(self):
+        out = []
+        for key, series in dict(self.values).items():
+            counts = series[:-1]
+            out.append({"labels": dict(key), "buckets": counts, "sum": series[-1], "count": sum(counts)})
+        return out
+
+
+def _register(cls, name, help_text, *args):
+    with _lock:
+        metric = _METRICS.get(name)
+        if metric is None:
+            metric = _METRICS[name] = cls(name, help_text, *args)
+        return metric
+
+
+def counter(name, help_text):
+    """Return the process-wide counter `name`, creating it on first use."""
+    return _register(Counter, name, help_text)
+
+
+def histogram(name, help_text, buckets=_DEFAULT_BUCKETS):
+    """Return the process-wide histogram `name` (seconds by default), creating it on first use."""
+    return _register(Histogram, name, help_text, buckets)
+
+
+_STAGE_SECONDS = histogram("pipeline_stage_seconds", "Wall-clock seconds per stage run (per shard for parse workers).")
+
+
+def snapshot():
+    """This process's metrics as a JSON-serializable dict."""
+    metrics = {}
+    for metric in list(_METRICS.values()):
+        metrics[metric.name] = {"type": metric.kind, "help": metric.help, "series": metric._series()}
+        if metric.kind == "histogram":
+            metrics[metric.name]["buckets"] = list(metric.buckets)
+    return {"pid": os.getpid(), "time": time.time(), "metrics": metrics}
+
+
+def _merge(total, part):
+    """Add one snapshot's series into `total` (counters and histogram buckets sum per label set)."""
+    for name, metric in part["metrics"].items():
+        merged = total.setdefault(name, {key: value for key, value in metric.items() if key != "series"})
+        series_by_labels = merged.setdefault("_by_labels", {})
+        for series in metric["series"]:
+            key = _key(series["labels"])
+            existing = series_by_labels.get(key)
+            if existing is None:
+                series_by_labels[key] = json.loads(json.dumps(series))
+            elif metric["type"] == "counter":
+                existing["value"] += series["value"]
+            else:
+                existing["buckets"] = [a + b for a, b in zip(existing["buckets"], series["buckets"])]
+                existing["sum"] += series["sum"]
+                existing["count"] += series["count"]
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _prometheus_text(merged):
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for series in metric["_by_labels"].values():
+            labels = series["labels"]
+            if metric["type"] == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {series['value']}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + ["+Inf"], series["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _parts_dir():
+    return Path(f"{METRICS_PATH}.parts")
+
+
+def _is_owner():
+    return os.environ.get(_OWNER_ENV) == str(os.getpid())
+
+
+def flush():
+    """Export now: the owner writes METRICS_PATH (merged with every worker's part), others write their part."""
+    if not METRICS_PATH or _OWNER_ENV not in os.environ:
+        return
+    own = snapshot()
+    if not _is_owner():
+        parts = _parts_dir()
+        parts.mkdir(parents=True, exist_ok=True)
+        _write_atomic(parts / f"{own['pid']}.json", json.dumps(own))
+        return
+
+    merged = {}
+    _merge(merged, own)
+    for part in sorted(_parts_dir().glob("*.json")):
+        try:
+            _merge(merged, json.loads(part.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # a part being replaced right now; it is picked up on the next export
+    if METRICS_PATH.endswith(".prom"):
+        _write_atomic(METRICS_PATH, _prometheus_text(merged))
+        return
+    for metric in merged.values():
+        metric["series"] = list(metric.pop("_by_labels").values())
+    _write_atomic(METRICS_PATH, json.dumps({"time": time.time(), "metrics": merged}, indent=2))
+
+
+def _export_loop():
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            print(f"Warning: unable to export metrics to {METRICS_PATH}: {e}")
+
+
+def _start_exporter():
+    global _exporter
+    if _exporter is not None and _exporter[0] == os.getpid():
+        return
+    thread = threading.Thread(target=_export_loop, name="metrics-export", daemon=True)
+    _exporter = (os.getpid(), thread)
+    thread.start()
+    atexit.register(flush)
+
+
+def start():
+    """
+    Begin exporting METRICS_PATH from this process (a no-op when METRICS_PATH is unset).
+
+    Call once from the entry point. If an ancestor already owns the export (e.g. main.py running
+    llm_processing.py), this process contributes a part file instead.
+    """
+    if not METRICS_PATH:
+        return
+    if _OWNER_ENV not in os.environ:
+        os.environ[_OWNER_ENV] = str(os.getpid())
+        parts = _parts_dir()
+        if parts.exists():
+            for stale in parts.glob("*.json"):
+                stale.unlink()
+    _start_exporter()
+
+
+def _after_fork_in_child():
+    # A forked worker starts from the parent's totals; count only its own work
+    for metric in list(_METRICS.values()):
+        metric.values.clear()
+    if METRICS_PATH and _OWNER_ENV in os.environ:
+        _start_exporter()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+if METRICS_PATH and _OWNER_ENV in os.environ and not _is_owner():
+    _start_exporter()  # spawned workers and subprocesses import this module fresh
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Time a unit of stage work into pipeline_stage_seconds{stage=name}, then flush.
+
+    Stages named in PROFILE_STAGES also run under cProfile (PROFILE_DIR/<name>.<pid>.prof) and,
+    with PROFILE_MEMORY=1, tracemalloc (top allocation sites in <name>.<pid>.tracemalloc.txt).
+    Usable as a decorator; worker processes rarely run atexit hooks, hence the flush.
+    """
+    profiler = None
+    if name in PROFILE_STAGES or "all" in PROFILE_STAGES:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        if PROFILE_MEMORY:
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _STAGE_SECONDS.observe(time.perf_counter() - t0, stage=name)
+        if profiler is not None:
+            profiler.disable()
+            base = PROFILE_DIR / f"{name}.{os.getpid()}"
+            profiler.dump_stats(f"{base}.prof")
+            print(f"Profile of stage {name} written to {base}.prof")
+            if PROFILE_MEMORY:
+                top = tracemalloc.take_snapshot().statistics("lineno")[:30]
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                with open(f"{base}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                    f.write(f"peak traced memory: {peak / 1e6:.1f} MB\n")
+                    f.writelines(f"{stat}\n" for stat in top)
+        flush()
@@ -0,0 +1,239 @@
+# Load-balanced pool of Ollama endpoints for the LLM stage
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from ollama import AsyncClient, ResponseError
+
+ROUTING_POLICIES = ("least-outstanding", "latency")
+# Transport/server failures that make a request worth retrying on another host
+RETRYABLE_ERRORS = (asyncio.TimeoutError, ResponseError, httpx.HTTPError, ConnectionError)
+
+
+def parse_endpoints(spec: str, default_model: str) -> List[Tuple[str, str]]:
+    """
+    Parse "host[=model],host[=model],..." into (host, model) pairs.
+
+    Hosts without "=model" use `default_model`, e.g.
+    "http://gpu1:11434,http://gpu2:11434=llama3.1:8b-instruct-q8_0".
+    """
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, model = item.partition("=")
+        endpoints.append((host.strip(), model.strip() or default_model))
+    if not endpoints:
+        raise ValueError(f"no Ollama endpoints in {spec!r}")
+    return endpoints
+
+
+class Endpoint:
+    """One Ollama server: its client plus the load and health figures the scheduler routes on."""
+
+    def __init__(self, host: str, model: str) -> None:
+        self.host = host
+        self.model = model
+        self.client: Optional[AsyncClient] = None
+        self.outstanding = 0
+        self.latency = 0.0  # EWMA of successful request latency, seconds
+        self.completed = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0  # ejections since the last successful request; sets the backoff
+        self.times_ejected = 0
+        self.ejected_until = 0.0
+        self.busy_time = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class EndpointPool:
+    """
+    Route chat requests across several Ollama endpoints.
+
+    Each request goes to the healthy endpoint with the fewest requests in flight ("least-outstanding")
+    or the lowest expected wait, latency EWMA x (in flight + 1) ("latency"). After `eject_after`
+    consecutive failures an endpoint is ejected for `cooldown` seconds, doubling on each repeat
+    ejection until it answers a request again. A failed request is retried on another endpoint,
+    at most once per endpoint.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Tuple[str, str]],
+        policy: str = "least-outstanding",
+        connections: int = 8,
+        timeout: float = 300.0,
+        keep_alive: Any = "30m",
+        eject_after: int = 2,
+        cooldown: float = 30.0,
+    ) -> None:
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"routing policy must be one of {ROUTING_POLICIES}, got {policy!r}")
+        self.endpoints = [Endpoint(host, model) for host, model in endpoints]
+        self.policy = policy
+        self.connections = connections
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.eject_after = eject_after
+        self.cooldown = cooldown
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = time.perf_counter()
+
+    @property
+    def models(self) -> List[str]:
+        """Distinct models served by the pool, in endpoint order."""
+        return list(dict.fromkeys(endpoint.model for endpoint in self.endpoints))
+
+    def _client(self, endpoint: Endpoint) -> AsyncClient:
+        # httpx clients are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for other in self.endpoints:
+                other.client = None
+            self._loop = loop
+        if endpoint.client is None:
+            endpoint.client = AsyncClient(
+                host=endpoint.host,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.connections,
+                    max_keepalive_connections=self.connections,
+                    keepalive_expiry=300,
+                ),
+            )
+        return endpoint.client
+
+    def pick(self, exclude: Tuple[Endpoint, ...] = ()) -> Optional[Endpoint]:
+        """Best endpoint not in `exclude`; if all are ejected, the one whose cooldown ends first."""
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude]
+        if not candidates:
+            return None
+        healthy = [e for e in candidates if e.healthy(now)]
+        if not healthy:
+            return min(candidates, key=lambda e: e.ejected_until)
+        if self.policy == "latency":
+            return min(healthy, key=lambda e: (e.latency * (e.outstanding + 1), e.outstanding))
+        return min(healthy, key=lambda e: (e.outstanding, e.latency))
+
+    def _record_failure(self, endpoint: Endpoint, exc: BaseException) -> None:
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures < self.eject_after:
+            return
+        now = time.monotonic()
+        was_healthy = endpoint.healthy(now)
+        backoff = self.cooldown * 2 ** min(endpoint.ejections, 5)
+        endpoint.ejected_until = now + backoff
+        endpoint.ejections += 1
+        endpoint.consecutive_failures = 0
+        # With every endpoint ejected, traffic still reaches this one; only log the transition
+        if was_healthy:
+            endpoint.times_ejected += 1
+            print(
+                f"Warning: ejecting Ollama endpoint {endpoint.host} for {backoff:.0f}s after "
+                f"{type(exc).__name__}: {exc}"
+            )
+
+    def _record_success(self, endpoint: Endpoint, elapsed: float) -> None:
+        endpoint.latency = elapsed if endpoint.completed == 0 else 0.8 * endpoint.latency + 0.2 * elapsed
+        endpoint.completed += 1
+        endpoint.consecutive_failures = 0
+        if endpoint.ejections:
+            endpoint.ejections = 0
+            endpoint.ejected_until = 0.0
+            print(f"Ollama endpoint {endpoint.host} answered again; re-admitting it")
+
+    async def _send(
+        self, endpoint: Endpoint, request: Dict[str, Any], until: Optional[Callable[[], Callable[[str], bool]]]
+    ) -> Dict[str, Any]:
+        client = self._client(endpoint)
+        if until is None:
+            return await client.chat(model=endpoint.model, keep_alive=self.keep_alive, **request)
+
+        # Stream, and hang up as soon as the predicate says the reply is complete
+        finished = until()
+        parts: List[str] = []
+        final: Optional[Any] = None
+        stream = await client.chat(model=endpoint.model, keep_alive=self.keep_alive, stream=True, **request)
+        try:
+            async for chunk in stream:
+                parts.append(chunk["message"]["content"])
+                if chunk.get("done"):
+                    final = chunk
+                    break
+                if finished(parts[-1]):
+                    break
+        finally:
+            await stream.aclose()
+        # The server's token counts only come with the final frame, so a reply cut short has none;
+        # Ollama streams about one token per chunk, which gives an estimate kept apart from them
+        return {
+            "message": {"content": "".join(parts)},
+            "prompt_eval_count": final.get("prompt_eval_count") if final is not None else None,
+            "eval_count": final.get("eval_count") if final is not None else None,
+            "estimated_eval_count": None if final is not None else len(parts),
+            "done_reason": final.get("done_reason") if final is not None else "stop",
+        }
+
+    async def chat(
+        self, until: Optional[Callable[[], Callable[[str], bool]]] = None, **request: Any
+    ) -> Tuple[Dict[str, Any], Endpoint]:
+        """
+        Send `request` (minus the model, which each endpoint supplies) and return (response, endpoint).
+
+        With `until`, the reply is streamed. `until()` is called once per attempt and returns a
+        predicate fed each streamed chunk; once it returns True the connection is closed, so the
+        server stops generating. Raises the last error once every endpoint has failed the request.
+        """
+        tried: Tuple[Endpoint, ...] = ()
+        last_exc: Optional[BaseException] = None
+        while True:
+            endpoint = self.pick(tried)
+            if endpoint is None:
+                assert last_exc is not None
+                raise last_exc
+            tried += (endpoint,)
+            endpoint.outstanding += 1
+            t0 = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self._send(endpoint, request, until), timeout=self.timeout)
+            except RETRYABLE_ERRORS as exc:
+                self._record_failure(endpoint, exc)
+                last_exc = exc
+                continue
+            finally:
+                endpoint.outstanding -= 1
+                endpoint.busy_time += time.perf_counter() - t0
+            self._record_success(endpoint, time.perf_counter() - t0)
+            return response, endpoint
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-endpoint throughput and health since the pool was created."""
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        return [
+            {
+                "host": e.host,
+                "model": e.model,
+                "completed": e.completed,
+                "failures": e.failures,
+                "ejections": e.times_ejected,
+                "requests_per_s": e.completed / elapsed,
+                "latency_ewma_s": e.latency,
+            }
+            for e in self.endpoints
+        ]
+
+    async def close(self) -> None:
+        for endpoint in self.endpoints:
+            if endpoint.client is not None:
+                await endpoint.client.close()
+                endpoint.client = None
+        self._loop = None
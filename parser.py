@@ -1,7 +1,32 @@
 # Parsing script to convert Wikipedia XML dump to JSONL format
 import xml.etree.ElementTree as ET
 import json
+import os
+import re
 import bz2  # used for opening .bz2 compressed files
+import mmap
+import queue
+import threading
+import time
+from bisect import bisect_left
+
+import metrics
+
+# A bz2 stream starts with "BZh" + block size digit, followed by the block magic (pi in BCD)
+_BZ2_STREAM_RE = re.compile(rb'BZh[1-9]\x31\x41\x59\x26\x53\x59')
+_SCAN_CHUNK = 1 << 20  # 1MB reads when scanning for stream boundaries
+_READ_CHUNK = 1 << 20  # 1MB compressed reads when decompressing a byte range
+_PROBE_LIMIT = 4 << 20  # give up validating a candidate stream after 4MB of compressed input
+_SCAN_LIMIT = 64 << 20  # multistream dumps start a stream every few hundred KB; stop looking after 64MB
+_PIPELINE_BLOCK = 8 << 20  # decompressed bytes handed to the XML parser per queue item
+_PIPELINE_DEPTH = 4  # blocks buffered between the decompression thread and the parser
+
+_PAGES_PARSED = metrics.counter("pipeline_pages_parsed_total", "<page> elements read from the dumps.")
+_PAGES_SKIPPED = metrics.counter("pipeline_pages_skipped_total", "Pages dropped because their title is not notable.")
+_ARTICLES = metrics.counter("pipeline_articles_total", "ns=0, non-redirect articles produced by the parser.")
+_BYTES_IN = metrics.counter("pipeline_parse_bytes_in_total", "Compressed dump bytes read by the parser.")
+_BYTES_OUT = metrics.counter("pipeline_parse_bytes_out_total", "JSONL bytes written by the parser.")
+
 
 def find_namespace(dump_path):
     """
@@ -18,58 +43,404 @@ def find_namespace(dump_path):
             if event == 'start-ns' and value[0] == '':  # type: ignore
                 # The namespace URI is the second item in the tuple
                 return value[1] # type: ignore
-    
+
     raise ValueError("Could not find the default namespace in the XML file.")
 
 
-def parse_wiki_dump(dump_path, output_jsonl_path):
-    """_summary_
+def _index_path(dump_path):
+    """Return the multistream index path that sits next to a multistream dump, if any."""
+    name = os.path.basename(dump_path)
+    if '-multistream' not in name:
+        return None
+    index_name = name.replace('-multistream.xml.bz2', '-multistream-index.txt.bz2')
+    index_path = os.path.join(os.path.dirname(dump_path), index_name)
+    return index_path if index_name != name and os.path.exists(index_path) else None
+
+
+def _read_index_offsets(index_path):
+    """Read the unique stream offsets from a multistream index (lines of offset:page_id:title)."""
+    offsets = set()
+    with bz2.open(index_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            offset, _, _ = line.partition(':')
+            if offset.isdigit():
+                offsets.add(int(offset))
+    return sorted(offsets)
+
+
+def _starts_with_page(f, offset):
+    """Check that a bz2 stream begins at `offset` and its first bytes are a <page> element."""
+    f.seek(offset)
+    decompressor = bz2.BZ2Decompressor()
+    consumed = 0
+    try:
+        while consumed < _PROBE_LIMIT and not decompressor.eof:
+            raw = f.read(64 * 1024)
+            if not raw:
+                return False
+            consumed += len(raw)
+            data = decompressor.decompress(raw).lstrip()
+            if data:
+                return data.startswith(b'<page')
+    except (OSError, EOFError):
+        # Not a real stream header (the magic appeared inside compressed data)
+        return False
+    return False
+
+
+def _scan_stream_offset(f, position, limit):
+    """Return the first page-aligned bz2 stream offset in [position, limit), or None."""
+    while position < limit:
+        f.seek(position)
+        # Overlap reads by the magic length so a boundary split across chunks is still found
+        block = f.read(_SCAN_CHUNK + 9)
+        if not block:
+            return None
+        for match in _BZ2_STREAM_RE.finditer(block):
+            candidate = position + match.start()
+            if candidate >= limit:
+                return None
+            if _starts_with_page(f, candidate):
+                return candidate
+        position += _SCAN_CHUNK
+    return None
+
+
+def split_dump(dump_path, parts):
+    """
+    Cut a dump into byte ranges that each start on a bz2 stream holding whole <page> elements.
+
+    Multistream dumps are split using their index file when present, otherwise by scanning
+    for bz2 stream headers near each cut. Other dumps hold a single stream and come back as
+    one range without being read.
 
     Args:
         dump_path (String): file path to Wikipedia dump .bz2
-        output_jsonl_path (String): file path to output .jsonl file
+        parts (int): desired number of ranges
+
+    Returns:
+        list of (start, end) byte offsets; `end` is None for the range that runs to EOF
     """
-    
+    file_size = os.path.getsize(dump_path)
+    if parts <= 1 or file_size == 0 or '-multistream' not in os.path.basename(dump_path):
+        return [(0, None)]
+
+    index_path = _index_path(dump_path)
+    offsets = _read_index_offsets(index_path) if index_path else None
+
+    starts = [0]
+    with open(dump_path, 'rb') as f:
+        for k in range(1, parts):
+            target = max(k * file_size // parts, starts[-1] + 1)
+            candidate = None
+            if offsets:
+                # First indexed stream at or after the target position
+                pos = bisect_left(offsets, target)
+                if pos < len(offsets) and _starts_with_page(f, offsets[pos]):
+                    candidate = offsets[pos]
+            if candidate is None:
+                candidate = _scan_stream_offset(f, target, min(file_size, target + _SCAN_LIMIT))
+            if candidate is None:
+                continue  # no stream starts near this cut; the previous range absorbs it
+            if candidate > starts[-1]:
+                starts.append(candidate)
+
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+def _iter_decompressed(dump_path, start=0, end=None, stats=None):
+    """Yield decompressed blocks for the bz2 streams stored in dump_path[start:end]."""
+    if stats is None:
+        stats = {}
+    stats.setdefault('compressed_bytes', 0)
+    stats.setdefault('decompress_seconds', 0.0)
+    with open(dump_path, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        decompressor = bz2.BZ2Decompressor()
+        in_stream = False
+        while remaining is None or remaining > 0:
+            size = _READ_CHUNK if remaining is None else min(_READ_CHUNK, remaining)
+            raw = f.read(size)
+            if not raw:
+                break
+            if remaining is not None:
+                remaining -= len(raw)
+            stats['compressed_bytes'] += len(raw)
+            in_stream = True
+            # A multistream range holds many concatenated streams; restart the decompressor at each one
+            while raw:
+                t0 = time.perf_counter()
+                block = decompressor.decompress(raw)
+                stats['decompress_seconds'] += time.perf_counter() - t0
+                if block:
+                    yield block
+                if decompressor.eof:
+                    raw = decompressor.unused_data
+                    decompressor = bz2.BZ2Decompressor()
+                    in_stream = bool(raw)
+                else:
+                    raw = b''
+        if in_stream:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def _iter_pipelined(dump_path, start=0, end=None, stats=None):
+    """
+    Yield large decompressed blocks produced by a background decompression thread.
+
+    bz2 decompression releases the GIL, so the thread keeps decompressing while the caller
+    parses. Blocks of ~_PIPELINE_BLOCK bytes pass through a queue bounded at _PIPELINE_DEPTH,
+    which keeps memory flat when the parser is the slower stage. `stats` records how long
+    each side spent waiting on the other.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('parser_wait_seconds', 0.0)  # parser starved: decompression is the bottleneck
+    stats.setdefault('reader_wait_seconds', 0.0)  # queue full: parsing is the bottleneck
+    blocks = queue.Queue(maxsize=_PIPELINE_DEPTH)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        t0 = time.perf_counter()
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats['reader_wait_seconds'] += time.perf_counter() - t0
+
+    def produce():
+        try:
+            pending = []
+            pending_size = 0
+            for block in _iter_decompressed(dump_path, start, end, stats):
+                if stop.is_set():
+                    return
+                pending.append(block)
+                pending_size += len(block)
+                if pending_size >= _PIPELINE_BLOCK:
+                    put(b''.join(pending))
+                    pending, pending_size = [], 0
+            if pending:
+                put(b''.join(pending))
+            put(done)
+        except BaseException as exc:  # surface decompression errors in the parsing thread
+            put(exc)
+
+    reader = threading.Thread(target=produce, name=f'bz2-reader-{start}', daemon=True)
+    reader.start()
     try:
-        ns_uri = find_namespace(dump_path)
-        NS = f'{{{ns_uri}}}'
-        print(f"Namespace found: {NS}")
-    except ValueError as e:
-        print(f"Error: {e}")
-        return
-    
-    # Open output .jsonl file for appending UTF-8 JSON records
-    with open(output_jsonl_path, 'w', encoding='utf-8') as out_file:
-        parser = ET.XMLPullParser(['end'])
+        while True:
+            t0 = time.perf_counter()
+            item = blocks.get()
+            stats['parser_wait_seconds'] += time.perf_counter() - t0
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+def _report_throughput(label, stats, pages, elapsed):
+    """Print compressed MB/s, pages/s and where each pipeline stage spent its time."""
+    elapsed = max(elapsed, 1e-9)
+    mb = stats.get('compressed_bytes', 0) / (1 << 20)
+    parser_wait = stats.get('parser_wait_seconds', 0.0)
+    reader_wait = stats.get('reader_wait_seconds', 0.0)
+    bottleneck = 'decompression' if parser_wait > reader_wait else 'XML parsing'
+    print(
+        f"Throughput {label}: {mb:.1f} MB compressed in {elapsed:.2f}s "
+        f"({mb / elapsed:.2f} MB/s, {pages / elapsed:.0f} pages/s); "
+        f"decompress busy {stats.get('decompress_seconds', 0.0):.2f}s, "
+        f"parser waited {parser_wait:.2f}s, reader waited {reader_wait:.2f}s "
+        f"-> bottleneck: {bottleneck}"
+    )
+
+
+def iter_wiki_pages(dump_path, ns_uri, start=0, end=None, allowed_titles=None, stats=None):
+    """Yield (title, text) for the ns=0, non-redirect articles of a dump or byte range.
+
+    Args are as for parse_wiki_dump (ns_uri is required here). When given, `stats` receives the
+    pipeline timings plus 'pages' (every <page> seen) and 'skipped' (dropped by allowed_titles).
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('pages', 0)
+    stats.setdefault('skipped', 0)
+    NS = f'{{{ns_uri}}}'
+    parser = ET.XMLPullParser(['end'])
+    skip_page = False  # set once a page's <title> is not in allowed_titles
+    # Ranges after the first lack the <mediawiki> header, and ranges before the last lack the
+    # closing tag, so wrap them in a synthetic root element carrying the dump's namespace.
+    if start != 0:
+        parser.feed(f'<mediawiki xmlns="{ns_uri}">'.encode('utf-8'))
+    counted_bytes = 0
+    for chunk in _iter_pipelined(dump_path, start, end, stats):
+        _BYTES_IN.inc(stats['compressed_bytes'] - counted_bytes)
+        counted_bytes = stats['compressed_bytes']
+        parser.feed(chunk)
+        # parser.read_events() will yield events as they are parsed from the chunk
+        for event, elem in parser.read_events(): # type: ignore
+            tag = elem.tag # type: ignore
+            if tag == f'{NS}title' and allowed_titles is not None:
+                # <title> precedes <revision>, so non-notable pages are known before their text
+                skip_page = (elem.text or '').strip().upper() not in allowed_titles # type: ignore
+                continue
+
+            if tag != f'{NS}page':
+                if skip_page:
+                    elem.clear() # type: ignore # Drop the text of unwanted pages as soon as it is parsed
+                continue
+
+            # Find page elems
+            stats['pages'] += 1
+            _PAGES_PARSED.inc()
+            if skip_page:
+                skip_page = False
+                stats['skipped'] += 1
+                _PAGES_SKIPPED.inc()
+                elem.clear() # type: ignore
+                continue
+
+            # Skip redirect pages
+            if elem.find(f'.//{NS}redirect') is not None: # type: ignore
+                elem.clear() # type: ignore
+                continue
+
+            # Find the articles <ns=0> using the NAMESPACE.
+            if elem.findtext(f'.//{NS}ns') == '0': # type: ignore
+                # Find title and text
+                title = elem.findtext(f'.//{NS}title') # type: ignore
+                text = elem.findtext(f'.//{NS}revision/{NS}text') # type: ignore
+
+                if title is not None and text is not None:
+                    _ARTICLES.inc()
+                    yield title, text
+
+            elem.clear() # type: ignore # Clear the element from memory, keep memory usage low
+    if end is not None:
+        parser.feed(b'</mediawiki>')
+
+    parser.close()
+    _BYTES_IN.inc(stats['compressed_bytes'] - counted_bytes)
+
+
+def parse_wiki_dump(dump_path, output_jsonl_path, start=0, end=None, ns_uri=None, allowed_titles=None):
+    """Parse ns=0 articles of a dump (or one byte range of a multistream dump) into JSONL.
+
+    Args:
+        dump_path (String): file path to Wikipedia dump .bz2
+        output_jsonl_path (String): file path to output .jsonl file
+        start (int): byte offset of the first bz2 stream to parse (see split_dump)
+        end (int | None): byte offset where the range stops, None for EOF
+        ns_uri (String | None): namespace from find_namespace; looked up if not given
+        allowed_titles (set | None): upper-cased titles to keep (the keys of
+            extractor.load_famous_name_map); other pages are dropped as soon as their
+            <title> is parsed. None keeps every article.
+    """
+
+    if ns_uri is None:
+        try:
+            ns_uri = find_namespace(dump_path)
+            print(f"Namespace found: {{{ns_uri}}}")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    # Open output .jsonl file for appending UTF-8 JSON records, plus its title index sidecar
+    with open(output_jsonl_path, 'w', encoding='utf-8') as out_file, \
+            open(title_index_path(output_jsonl_path), 'w', encoding='utf-8') as index_file:
+        offset = 0
         i = 0
-        with bz2.open(dump_path, 'rb') as f:
-            for chunk in f:
-                parser.feed(chunk)
-                # parser.read_events() will yield events as they are parsed from the chunk
-                for event, elem in parser.read_events(): # type: ignore                    
-                    if event == 'end' and elem.tag == f'{NS}page': # type: ignore # Find page elems
-                        # Skip redirect pages
-                        if elem.find(f'.//{NS}redirect') is not None: # type: ignore
-                            elem.clear() # type: ignore
+        stats = {}
+        t_start = time.perf_counter()
+        for title, text in iter_wiki_pages(dump_path, ns_uri, start, end, allowed_titles, stats):
+            record = {
+                'title': title,
+                'text': text
+            }
+            # json.dumps escapes non-ASCII, so the line's length is its size in bytes
+            line = json.dumps(record) + '\n'
+            out_file.write(line)
+            _BYTES_OUT.inc(len(line))
+            index_file.write(f"{title.strip().upper()}\t{offset}\t{len(line)}\n")
+            offset += len(line)
+
+            i += 1
+        index_file.write(f"#bytes\t{offset}\n")
+
+    range_label = f"{os.path.basename(dump_path)} [{start}:{end if end is not None else 'EOF'}]"
+    _report_throughput(range_label, stats, stats['pages'], time.perf_counter() - t_start)
+    skipped_note = f" (skipped {stats['skipped']} pages not in the title allow-set)" if allowed_titles is not None else ""
+    print(f"Parsing complete: wrote {i} elements from {dump_path} [{start}:{end if end is not None else 'EOF'}] to {output_jsonl_path}{skipped_note}")
+
+
+def title_index_path(jsonl_path):
+    """Sidecar index written next to every parsed JSONL: one 'TITLE<TAB>offset<TAB>length' line per record."""
+    return f"{jsonl_path}.titles.tsv"
+
+
+def merge_title_indexes(shard_paths, combined_jsonl_path):
+    """
+    Write the title index for the concatenation of shard_paths (in order) and remove the shard indexes.
+
+    Must run before the shards themselves are combined and deleted, since offsets are rebased
+    by each shard's size.
+    """
+    base = 0
+    with open(title_index_path(combined_jsonl_path), 'w', encoding='utf-8') as out:
+        for shard_path in shard_paths:
+            shard_index = title_index_path(shard_path)
+            if os.path.exists(shard_index):
+                with open(shard_index, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.startswith('#'):
                             continue
+                        title, offset, length = line.rstrip('\n').split('\t')
+                        out.write(f"{title}\t{base + int(offset)}\t{length}\n")
+                os.remove(shard_index)
+            base += os.path.getsize(shard_path)
+        out.write(f"#bytes\t{base}\n")
+
+
+def load_title_index(jsonl_path, wanted_titles=None):
+    """
+    Return [(offset, length)] sorted by offset for records whose upper-cased title is wanted.
 
-                        # Find the articles <ns=0> using the NAMESPACE.
-                        if elem.findtext(f'.//{NS}ns') == '0': # type: ignore
-                            # Find title and text
-                            title = elem.findtext(f'.//{NS}title') # type: ignore
-                            text = elem.findtext(f'.//{NS}revision/{NS}text') # type: ignore
-
-                            if title is not None and text is not None:
-                                record = {
-                                    'title': title,
-                                    'text': text
-                                }
-                                out_file.write(json.dumps(record) + '\n')
-                                
-                                i += 1
-
-                        elem.clear() # type: ignore # Clear the element from memory, keep memory usage low
-
-        parser.close()
-    
-    print(f"Parsing complete: wrote {i} elements from {dump_path} to {output_jsonl_path}")
+    Returns None when the index is missing or does not describe the current file (size mismatch),
+    in which case callers should fall back to scanning the JSONL.
+    """
+    index_path = title_index_path(jsonl_path)
+    if not os.path.exists(index_path):
+        return None
+    entries = []
+    indexed_bytes = None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            title, _, rest = line.rstrip('\n').partition('\t')
+            if title == '#bytes':
+                indexed_bytes = int(rest)
+                continue
+            if wanted_titles is None or title in wanted_titles:
+                offset, _, length = rest.partition('\t')
+                entries.append((int(offset), int(length)))
+    if indexed_bytes != os.path.getsize(jsonl_path):
+        return None
+    entries.sort()
+    return entries
+
+
+def iter_indexed_lines(jsonl_path, entries):
+    """Yield the JSONL lines at the given (offset, length) entries, reading them through mmap."""
+    if not entries:
+        return
+    with open(jsonl_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset, length in entries:
+            yield mm[offset:offset + length].decode('utf-8')
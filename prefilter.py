@@ -0,0 +1,57 @@
+# Cheap lexical first stage that rejects obvious non-residence sentences before embedding
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.pipeline import make_pipeline
+
+PREFILTER_PATH = Path(__file__).resolve().parent / "residence_prefilter.joblib"
+DEFAULT_RECALL_TARGET = 0.99
+
+
+def _make_pipeline():
+    # Hashed word 1-2 grams: no vocabulary to store, and transform is a single C pass per sentence
+    return make_pipeline(
+        HashingVectorizer(ngram_range=(1, 2), n_features=2 ** 18, alternate_sign=False, lowercase=True),
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+    )
+
+
+def threshold_for_recall(positive_scores, recall_target):
+    """Highest decision threshold that still passes `recall_target` of the calibration positives."""
+    scores = np.sort(np.asarray(positive_scores))
+    if scores.size == 0:
+        return float("-inf")
+    drop = int(np.floor((1.0 - recall_target) * scores.size))
+    return float(scores[min(drop, scores.size - 1)])
+
+
+def train_prefilter(texts, labels, recall_target=DEFAULT_RECALL_TARGET):
+    """
+    Fit the hashed n-gram model and calibrate its pass threshold.
+
+    The threshold comes from out-of-fold scores of the training positives, so it is not fitted
+    to sentences the model has memorized. Those scores are kept in the artifact, so the
+    extractor can pick a different recall target without retraining.
+    """
+    labels = np.asarray(labels)
+    pipeline = _make_pipeline()
+    folds = max(2, min(5, int(labels.sum()), int((labels == 0).sum())))
+    oof_scores = cross_val_predict(pipeline, texts, labels, cv=folds, method="decision_function")
+    positive_scores = np.sort(oof_scores[labels == 1])
+    pipeline.fit(texts, labels)
+    return {
+        "pipeline": pipeline,
+        "positive_scores": positive_scores,
+        "recall_target": recall_target,
+        "threshold": threshold_for_recall(positive_scores, recall_target),
+    }
+
+
+def prefilter_mask(prefilter, sentences, threshold=None):
+    """Boolean array: True for sentences that must go on to the embedding classifier."""
+    if threshold is None:
+        threshold = prefilter["threshold"]
+    return prefilter["pipeline"].decision_function(sentences) >= threshold
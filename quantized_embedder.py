@@ -0,0 +1,151 @@
+# Optional int8 CPU backend for the residence classifier: the embedder as a dynamically quantized
+# ONNX graph run by ONNX Runtime, and the logistic regression as plain arrays
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from checkpoint import file_sha256
+from classifier_artifact import LinearClassifier
+
+QUANTIZED_DIR = Path(__file__).resolve().parent / "residence_classifier_int8"
+_ONNX_NAME = "embedder.int8.onnx"
+_CLASSIFIER_NAME = "classifier.npz"
+_META_NAME = "meta.json"
+
+
+class QuantizedEmbedder:
+    """Mean-pooled sentence embeddings from the int8 ONNX transformer; `encode` mirrors SentenceTransformer's."""
+
+    def __init__(self, model_dir=QUANTIZED_DIR):
+        # Imported here so the fp32 path never needs onnxruntime or tokenizers installed
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self.meta = json.loads((model_dir / _META_NAME).read_text(encoding="utf-8"))
+        self._tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(self.meta["max_seq_length"])
+        self._tokenizer.enable_padding(pad_id=self.meta["pad_token_id"], pad_token=self.meta["pad_token"])
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = onnxruntime.InferenceSession(
+            str(model_dir / _ONNX_NAME), options, providers=["CPUExecutionProvider"]
+        )
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False):
+        embeddings = []
+        for i in range(0, len(sentences), batch_size):
+            encodings = self._tokenizer.encode_batch(list(sentences[i:i + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            tokens = self._session.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.meta["normalize"]:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.append(pooled)
+        if not embeddings:
+            return np.zeros((0, self.meta["dimension"]), dtype=np.float32)
+        return np.concatenate(embeddings)
+
+
+def export_quantized(embedder, clf, model_dir=QUANTIZED_DIR):
+    """
+    Write the int8 backend for a trained (SentenceTransformer, LogisticRegression) pair to `model_dir`.
+
+    The transformer is exported to ONNX and its weights quantized to int8 with ONNX Runtime's
+    dynamic quantization; pooling and normalization run in numpy at inference time, so only
+    mean-pooled models (like all-MiniLM-L6-v2) are supported.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers.models import Normalize, Pooling
+
+    pooling = next((module for module in embedder if isinstance(module, Pooling)), None)
+    if pooling is None or not pooling.pooling_mode_mean_tokens:
+        raise ValueError("only mean-pooled sentence transformers can be exported")
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = embedder.tokenizer
+    sample = tokenizer(["She moved to Vienna in 1901."], return_tensors="pt")
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path = Path(tmp) / "embedder.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                TokenEmbeddings(embedder[0].auto_model.eval()),
+                (sample["input_ids"], sample["attention_mask"]),
+                str(fp32_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["token_embeddings"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "tokens"},
+                    "attention_mask": {0: "batch", 1: "tokens"},
+                    "token_embeddings": {0: "batch", 1: "tokens"},
+                },
+                opset_version=14,
+            )
+        quantize_dynamic(str(fp32_path), str(model_dir / _ONNX_NAME), weight_type=QuantType.QInt8)
+
+    # tokenizer.json is all the tokenizers library needs, so inference skips transformers and torch
+    with tempfile.TemporaryDirectory() as tmp:
+        tokenizer.save_pretrained(tmp)
+        shutil.copy(Path(tmp) / "tokenizer.json", model_dir / "tokenizer.json")
+    LinearClassifier.from_sklearn(clf).save(model_dir / _CLASSIFIER_NAME)
+    meta = {
+        "max_seq_length": embedder.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+        "dimension": embedder.get_sentence_embedding_dimension(),
+        "normalize": any(isinstance(module, Normalize) for module in embedder),
+        "files": {
+            name: file_sha256(model_dir / name) for name in (_ONNX_NAME, "tokenizer.json", _CLASSIFIER_NAME)
+        },
+    }
+    (model_dir / _META_NAME).write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+    return model_dir
+
+
+def load_quantized(model_dir=QUANTIZED_DIR):
+    """Return the (embedder, classifier) pair of the int8 backend, interchangeable with the fp32 one."""
+    model_dir = Path(model_dir)
+    return QuantizedEmbedder(model_dir), LinearClassifier.load(model_dir / _CLASSIFIER_NAME)
+
+
+def quantized_hash(model_dir=QUANTIZED_DIR):
+    """sha256 identifying an exported backend (its meta.json lists the hashes of every file)."""
+    meta_path = Path(model_dir) / _META_NAME
+    return file_sha256(meta_path) if meta_path.exists() else None
+
+
+def agreement(reference, candidate, texts, threshold=0.5, batch_size=256):
+    """
+    Compare two (embedder, classifier) pairs on `texts`.
+
+    Returns the number of sentences classified differently at `threshold`, how many each model
+    calls positive, and the largest absolute probability difference.
+    """
+    probs = []
+    for embedder, clf in (reference, candidate):
+        X = embedder.encode(texts, batch_size=batch_size, show_progress_bar=False)
+        probs.append(np.asarray(clf.predict_proba(X))[:, 1])
+    ref_pos = probs[0] >= threshold
+    cand_pos = probs[1] >= threshold
+    return {
+        "sentences": len(texts),
+        "differing": int((ref_pos != cand_pos).sum()),
+        "reference_positives": int(ref_pos.sum()),
+        "candidate_positives": int(cand_pos.sum()),
+        "max_abs_prob_diff": float(np.abs(probs[0] - probs[1]).max()) if len(texts) else 0.0,
+    }
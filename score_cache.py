@@ -0,0 +1,100 @@
+# Persistent cache of residence-classifier scores keyed by sentence hash
+import hashlib
+import sqlite3
+import time
+
+_QUERY_CHUNK = 900  # stay under SQLite's host-parameter limit on older builds
+
+
+def sentence_key(sentence):
+    """16-byte digest identifying a sentence (collisions are negligible at dump scale)."""
+    return hashlib.blake2b(sentence.encode('utf-8'), digest_size=16).digest()
+
+
+class SentenceScoreCache:
+    """
+    SQLite table of predict_proba scores for sentences already seen by the classifier.
+
+    Scores are only valid for the classifier artifact that produced them, so the cache
+    stores that artifact's hash and wipes itself when a different one is passed in.
+    Once the table grows past max_entries, the least recently used tenth is evicted.
+    """
+
+    def __init__(self, path, model_hash, max_entries=20_000_000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # WAL + busy timeout let several extractor processes share one cache file
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, score REAL NOT NULL, last_used INTEGER NOT NULL) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'model_hash'").fetchone()
+        if row is None or row[0] != model_hash:
+            if row is not None:
+                print(f"Classifier artifact changed; clearing sentence score cache at {self.path}")
+            self._conn.execute('DELETE FROM scores')
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('model_hash', ?)", (model_hash,))
+        self._conn.commit()
+        self._size = self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def get_many(self, sentences):
+        """Return {index: score} for the sentences already in the cache and mark them as used."""
+        keys = [sentence_key(s) for s in sentences]
+        found = {}
+        for i in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[i:i + _QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(self._conn.execute(
+                f'SELECT key, score FROM scores WHERE key IN ({placeholders})', chunk
+            ).fetchall())
+
+        hits = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(hits)
+        self.misses += len(keys) - len(hits)
+        if found:
+            now = int(time.time())
+            self._conn.executemany('UPDATE scores SET last_used = ? WHERE key = ?', [(now, k) for k in found])
+            self._conn.commit()
+        return hits
+
+    def put_many(self, sentences, scores):
+        """Store freshly computed scores, evicting old entries if the cache is over its cap."""
+        now = int(time.time())
+        rows = [(sentence_key(s), float(p), now) for s, p in zip(sentences, scores)]
+        self._conn.executemany('INSERT OR REPLACE INTO scores (key, score, last_used) VALUES (?, ?, ?)', rows)
+        self._size += len(rows)
+        if self._size > self.max_entries:
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        # Recount first: other processes sharing the file may have inserted or evicted too
+        self._size = self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        excess = self._size - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._conn.execute(
+            'DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self._size -= excess
+        self.evicted += excess
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evicted': self.evicted,
+            'entries': self._size,
+        }
+
+    def close(self):
+        self._conn.close()
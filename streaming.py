@@ -0,0 +1,158 @@
+# Fused parse -> extract -> LLM pipeline over bounded in-memory queues
+import asyncio
+import json
+import os
+import queue
+import time
+
+import extractor
+import metrics
+from extractor import EMBED_POOL_SENTENCES, _report_embedding_rate, _score_pending, _split_sentences
+from llm_processing import process_with_llm
+from parser import _report_throughput, iter_wiki_pages
+
+STREAM_PARSE_WORKERS = int(os.getenv("STREAM_PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+STREAM_PAGE_QUEUE = int(os.getenv("STREAM_PAGE_QUEUE", "256"))  # stripped pages waiting for the embedder
+STREAM_RECORD_QUEUE = int(os.getenv("STREAM_RECORD_QUEUE", "1024"))  # scored records waiting for the LLM
+STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "5"))  # max wait for a full embedding pool
+_POLL_SECONDS = 1.0  # how often the LLM side checks that the other stages are still alive
+
+
+@metrics.stage("parse")
+def _parse_worker(tasks, famous_titles, pages):
+    """
+    Process target: parse byte ranges from `tasks` until a None arrives, putting (title, sentences)
+    for every notable article on `pages`, then a None of its own.
+    """
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        dump_path, start, end, ns_uri = task
+        stats = {}
+        t_start = time.perf_counter()
+        for title, text in iter_wiki_pages(dump_path, ns_uri, start, end, famous_titles, stats):
+            pages.put((title, _split_sentences(text)))
+        range_label = f"{os.path.basename(dump_path)} [{start}:{end if end is not None else 'EOF'}]"
+        _report_throughput(range_label, stats, stats['pages'], time.perf_counter() - t_start)
+    pages.put(None)
+
+
+@metrics.stage("extract")
+def _embed_worker(pages, records, producers, extracted_jsonl):
+    """
+    Process target: score the pages from `producers` parse workers in cross-article batches and put
+    the extractor records on `records`, then a None.
+
+    A batch is embedded once it holds EMBED_POOL_SENTENCES sentences or its first page has waited
+    STREAM_FLUSH_SECONDS, so a slow trickle of notable pages still reaches the LLM promptly.
+    Records are also appended to `extracted_jsonl` when it is given.
+    """
+    extractor._load_model()  # load while the parsers warm up rather than on the first batch
+    outfile = open(extracted_jsonl, 'w', encoding='utf-8') if extracted_jsonl else None
+    pending = []
+    pending_sentences = 0
+    deadline = None
+    remaining = producers
+    try:
+        while remaining:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                page = pages.get(timeout=timeout)
+            except queue.Empty:
+                page = ()  # nothing new; only the deadline may have passed
+            if page is None:
+                remaining -= 1
+            elif page:
+                pending.append(page)
+                pending_sentences += len(page[1])
+                if deadline is None:
+                    deadline = time.monotonic() + STREAM_FLUSH_SECONDS
+            if pending and (
+                not remaining or pending_sentences >= EMBED_POOL_SENTENCES or time.monotonic() >= deadline
+            ):
+                for record in _score_pending(pending):
+                    if outfile is not None:
+                        outfile.write(json.dumps(record) + '\n')
+                    records.put(record)
+                if outfile is not None:
+                    outfile.flush()
+                pending.clear()
+                pending_sentences = 0
+                deadline = None
+    finally:
+        if outfile is not None:
+            outfile.close()
+    records.put(None)
+    _report_embedding_rate("stream")
+
+
+async def _queued_records(records, processes):
+    """Yield records from the embedding process until its None; raise if any stage process died."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            record = await loop.run_in_executor(None, records.get, True, _POLL_SECONDS)
+        except queue.Empty:
+            for process in processes:
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError(f"{process.name} process exited with code {process.exitcode}")
+            continue
+        if record is None:
+            return
+        yield record
+
+
+def run_streaming(tasks, famous_titles, output_jsonl, extracted_jsonl=None, parse_workers=None, **llm_options):
+    """
+    Parse, extract and normalize with the LLM at the same time instead of stage by stage.
+
+    `tasks` are (dump_path, start, end, ns_uri) byte ranges (see parser.split_dump). Parse worker
+    processes turn them into stripped, sentence-split notable pages; one embedding process scores
+    them; async LLM workers in this process (process_with_llm, with `llm_options`) write
+    structured residences to `output_jsonl` as they finish. Bounded queues between the stages keep
+    memory flat and let the slowest stage set the pace while the others stay busy.
+
+    Records arrive in whatever order the parse workers produce them, and nothing is checkpointed:
+    an interrupted run starts over (replies already in the LLM response cache are not re-asked).
+    The parsed articles are never written; `extracted_jsonl` optionally keeps the extractor output.
+    """
+    parse_workers = max(1, min(parse_workers or STREAM_PARSE_WORKERS, len(tasks)))
+    context = extractor._process_context()
+    task_queue = context.Queue()
+    pages = context.Queue(STREAM_PAGE_QUEUE)
+    records = context.Queue(STREAM_RECORD_QUEUE)
+    for task in tasks:
+        task_queue.put(task)
+    for _ in range(parse_workers):
+        task_queue.put(None)
+
+    titles = frozenset(famous_titles)
+    processes = [
+        context.Process(target=_parse_worker, args=(task_queue, titles, pages), name=f"parse-{idx}", daemon=True)
+        for idx in range(parse_workers)
+    ]
+    processes.append(
+        context.Process(
+            target=_embed_worker, args=(pages, records, parse_workers, extracted_jsonl), name="embed", daemon=True
+        )
+    )
+    print(
+        f"Streaming {len(tasks)} byte range(s) through {parse_workers} parse workers, "
+        f"1 embedding worker and the async LLM workers..."
+    )
+    for process in processes:
+        process.start()
+
+    finished = False
+    try:
+        with metrics.stage("llm"):
+            asyncio.run(
+                process_with_llm("<stream>", output_jsonl, records=_queued_records(records, processes), **llm_options)
+            )
+        finished = True
+    finally:
+        for process in processes:
+            if not finished:
+                process.terminate()
+            process.join()
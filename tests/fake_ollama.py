@@ -0,0 +1,188 @@
+"""Stub Ollama server for offline runs: answers /api/chat from the prompt itself, with configurable latency and failures."""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_PLACE_RE = re.compile(r"\b(?:in|to|at)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)")
+_YEAR_RE = re.compile(r"\b(1[5-9]\d\d|20\d\d)\b")
+
+
+def _person_blocks(prompt: str) -> Dict[str, List[str]]:
+    """Map each 'Person: ...' block of a (single or packed) prompt to its '- sentence' lines."""
+    people: Dict[str, List[str]] = {}
+    person = None
+    for line in prompt.splitlines():
+        if "Person: " in line:  # the single-person prompt has no line break before it
+            person = line.split("Person: ", 1)[1]
+            people[person] = []
+        elif person is not None and line.startswith("- "):
+            people[person].append(line[2:])
+    return people
+
+
+def _residences(person: str, sentences: List[str]) -> List[Dict[str, str]]:
+    """What a well-behaved model would answer: one entry per sentence naming both a place and a year."""
+    entries = []
+    for sentence in sentences:
+        place = _PLACE_RE.search(sentence)
+        year = _YEAR_RE.search(sentence)
+        if place and year:
+            entries.append({"person": person, "residence": place.group(1), "time_span": year.group(1), "evidence": sentence})
+    return entries
+
+
+class StubOllama:
+    """
+    Threaded HTTP server speaking enough of Ollama's /api/chat for llm_processing.
+
+    Each request waits `latency` seconds plus `token_latency` per ~4-character output token
+    (streamed replies pace their chunks). At most `slots` requests are served at once, like
+    OLLAMA_NUM_PARALLEL; the rest queue. `failure_rate` of requests get an HTTP 500.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.2,
+        token_latency: float = 0.0,
+        failure_rate: float = 0.0,
+        slots: int = 4,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, slots))
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub._serve(self, body)
+
+        ThreadingHTTPServer.request_queue_size = 256
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _serve(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests += 1
+            failed = self._rng.random() < self.failure_rate
+            self.failures += failed
+        if failed:
+            self._send_json(handler, 500, {"error": "stub failure"})
+            return
+
+        prompt = body["messages"][-1]["content"]
+        people = _person_blocks(prompt)
+        if "several people" in prompt:
+            reply: Any = {person: _residences(person, sentences) for person, sentences in people.items()}
+        else:
+            person, sentences = next(iter(people.items()), ("", []))
+            reply = _residences(person, sentences)
+        content = json.dumps(reply)
+        if not body.get("format"):
+            content = f"Here is the JSON:\n{content}\n"
+        tokens = [content[i:i + 4] for i in range(0, len(content), 4)]
+        limit = (body.get("options") or {}).get("num_predict")
+        done_reason = "stop"
+        if limit and len(tokens) > limit:
+            tokens, done_reason = tokens[:limit], "length"
+        final = {
+            "model": body.get("model", ""),
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": done_reason,
+            "prompt_eval_count": len(prompt) // 4,
+            "eval_count": len(tokens),
+        }
+
+        with self._slots:
+            time.sleep(self.latency)
+            if body.get("stream"):
+                self._stream(handler, body, tokens, final)
+                return
+            time.sleep(self.token_latency * len(tokens))
+        final["message"]["content"] = "".join(tokens)
+        self._send_json(handler, 200, final)
+
+    def _stream(
+        self, handler: BaseHTTPRequestHandler, body: Dict[str, Any], tokens: List[str], final: Dict[str, Any]
+    ) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        try:
+            for token in tokens + [None]:
+                if token is None:
+                    chunk = final
+                else:
+                    time.sleep(self.token_latency)
+                    chunk = {"model": body.get("model", ""), "message": {"role": "assistant", "content": token}, "done": False}
+                line = json.dumps(chunk).encode("utf-8") + b"\n"
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                handler.wfile.flush()
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stops reading once the JSON is complete
+
+    @staticmethod
+    def _send_json(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]) -> None:
+        out = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(out)))
+        handler.end_headers()
+        handler.wfile.write(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stub Ollama /api/chat endpoint.")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on (default: 11435).")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request (default: 0.2).")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Extra seconds per output token (default: 0).")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500 (default: 0).")
+    parser.add_argument("--slots", type=int, default=4, help="Requests served concurrently; the rest queue (default: 4).")
+    args = parser.parse_args()
+    stub = StubOllama(args.port, args.latency, args.token_latency, args.failure_rate, args.slots).start()
+    print(f"Stub Ollama listening on {stub.url} (Ctrl-C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
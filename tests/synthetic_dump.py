@@ -0,0 +1,212 @@
+"""Generate a synthetic multistream Wikipedia dump with biography-like articles, plus a matching notable CSV."""
+from __future__ import annotations
+
+import argparse
+import bz2
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+NS_URI = "http://www.mediawiki.org/xml/export-0.11/"
+PAGES_PER_STREAM = 100  # Wikipedia's multistream dumps also pack 100 pages per bz2 stream
+
+_FIRST = (
+    "Anna Bruno Clara Dmitri Elena Felix Greta Hugo Ines Jonas Karin Leon Marta Nils Olga Pablo Rosa Stefan "
+    "Tereza Viktor Wanda Yusuf Zofia Amir Beatriz Cyril Dora Emil Farah Gustav"
+).split()
+_LAST = (
+    "Albrecht Barros Castell Dvorak Eklund Ferreira Gallo Hartmann Ivanova Jansen Kowalski Lindqvist Moreau "
+    "Novak Okafor Petrov Quint Rossi Santos Takahashi Ulrich Varga Weber Xu Yilmaz Zeller"
+).split()
+_CITIES = (
+    "Vienna Prague Lisbon Boston Kyoto Lagos Dublin Quebec Krakow Porto Seville Geneva Bergen Tbilisi Lima "
+    "Valparaiso Trieste Odessa Leipzig Montreal Havana Smyrna Alexandria Bruges"
+).split()
+_OCCUPATIONS = "painter novelist physicist composer architect botanist sculptor poet chemist diplomat".split()
+_FILLER = [
+    "{P} published several works on {topic} that were widely translated.",
+    "Critics praised {p2} early work for its attention to {topic}.",
+    "{P} received an honorary doctorate for contributions to {topic}.",
+    "The collection includes letters, drafts and notebooks from that period.",
+    "{P} toured {city} in {year} to present a new series on {topic}.",
+    "A retrospective of {p2} work opened at the national museum in {year}.",
+    "{P} served on the editorial board of a journal devoted to {topic}.",
+    "Several of these pieces were later lost during the war.",
+]
+_TOPICS = "light perspective harmony crystal structures urban planning folk songs alpine flora memory".split()
+
+
+def _pronouns(rng: random.Random) -> Tuple[str, str]:
+    return ("she", "her") if rng.random() < 0.5 else ("he", "his")
+
+
+def _residence_sentences(rng: random.Random, name: str, born: int, pronoun: str, count: int) -> List[Tuple[str, str]]:
+    """(wikitext, plain text) pairs for sentences that state where the person lived."""
+    pairs = []
+    year = born + rng.randint(15, 25)
+    for _ in range(count):
+        city = rng.choice(_CITIES)
+        until = year + rng.randint(2, 12)
+        template = rng.choice(
+            [
+                ("In {y} {p} moved to [[{c}]], where {p} lived until {u}.", "In {y} {p} moved to {c}, where {p} lived until {u}."),
+                ("{N} settled in [[{c}]] in {y} and remained there until {u}.", "{N} settled in {c} in {y} and remained there until {u}."),
+                ("From {y} to {u} {p} lived in [[{c}|{c}]].", "From {y} to {u} {p} lived in {c}."),
+            ]
+        )
+        fields = dict(y=year, u=until, c=city, p=pronoun, N=name)
+        pairs.append((template[0].format(**fields), template[1].format(**fields)))
+        year = until + rng.randint(0, 3)
+    return pairs
+
+
+def _article(rng: random.Random, name: str, filler: int) -> Tuple[str, List[str]]:
+    """Return (wikitext, planted residence sentences as the extractor should see them)."""
+    pronoun, possessive = _pronouns(rng)
+    born = rng.randint(1780, 1950)
+    died = born + rng.randint(40, 95)
+    birth_city = rng.choice(_CITIES)
+    occupation = rng.choice(_OCCUPATIONS)
+    residences = _residence_sentences(rng, name, born, pronoun, rng.randint(1, 5))
+
+    def filler_block(n: int) -> str:
+        sentences = []
+        for _ in range(n):
+            sentences.append(
+                rng.choice(_FILLER).format(
+                    P=pronoun.capitalize(), p2=possessive, topic=rng.choice(_TOPICS), city=rng.choice(_CITIES),
+                    year=rng.randint(born + 10, died),
+                )
+            )
+        return " ".join(sentences)
+
+    split = rng.randint(0, len(residences))
+    text = (
+        "{{Infobox person\n"
+        f"| name = {name}\n| birth_date = {{{{birth date|{born}|1|1}}}}\n"
+        f"| birth_place = [[{birth_city}]]\n| occupation = {occupation}\n}}}}\n"
+        f"'''{name}''' ({born}–{died}) was a [[{occupation}]]."
+        f"<ref>{{{{cite web |url=https://example.org/{born} |title={name}}}}}</ref> "
+        f"{filler_block(2)}\n\n"
+        "== Early life ==\n"
+        f"{name} was born in [[{birth_city}]] in {born}. "
+        + " ".join(wiki for wiki, _ in residences[:split])
+        + f" {filler_block(filler // 2)}\n\n"
+        "== Career ==\n"
+        f"{filler_block(filler - filler // 2)}\n"
+        "{| class=\"wikitable\"\n|-\n! Year !! Work\n|-\n| " + str(born + 30) + " || Untitled\n|}\n\n"
+        "== Personal life ==\n"
+        f"{name} married in {born + rng.randint(20, 40)}. "  # headings merge into the next sentence once stripped
+        + " ".join(wiki for wiki, _ in residences[split:])
+        + f" {pronoun.capitalize()} died in {died}.\n\n"
+        "== References ==\n{{reflist}}\n\n"
+        f"[[Category:{occupation.capitalize()}s]]"
+    )
+    return text, [plain for _, plain in residences]
+
+
+def _page_xml(page_id: int, title: str, text: str, ns: int = 0, redirect: str = "") -> str:
+    redirect_xml = f'    <redirect title="{escape(redirect)}" />\n' if redirect else ""
+    return (
+        f"  <page>\n    <title>{escape(title)}</title>\n    <ns>{ns}</ns>\n    <id>{page_id}</id>\n{redirect_xml}"
+        f"    <revision>\n      <id>{page_id}</id>\n"
+        f'      <text bytes="{len(text)}" xml:space="preserve">{escape(text)}</text>\n'
+        "    </revision>\n  </page>\n"
+    )
+
+
+def write_dump(
+    dump_path: Path, pages: int, notable_fraction: float = 0.2, filler: int = 30, seed: int = 0
+) -> Dict[str, object]:
+    """
+    Write `pages` pages to `dump_path` (a .xml.bz2 multistream dump with its -index.txt.bz2 next to it).
+
+    About 80% of pages are biographies, `notable_fraction` of which are notable; the rest are
+    redirects, talk pages and non-person articles. Next to the dump go `<stem>.notable.csv` (the
+    notable titles, in the notable_humans/result.csv format) and `<stem>.expected.jsonl` (the
+    residence sentences planted in each notable article, in extractor output format).
+    """
+    rng = random.Random(seed)
+    dump_path = Path(dump_path)
+    stem = dump_path.name[: -len(".xml.bz2")] if dump_path.name.endswith(".xml.bz2") else dump_path.stem
+    index_path = dump_path.with_name(f"{stem}-index.txt.bz2")
+    csv_path = dump_path.with_name(f"{stem}.notable.csv")
+    expected_path = dump_path.with_name(f"{stem}.expected.jsonl")
+
+    used_names = set()
+    notable = []
+    index_lines = []
+    header = (
+        f'<mediawiki xmlns="{NS_URI}" version="0.11" xml:lang="en">\n'
+        "  <siteinfo>\n    <sitename>Wikipedia</sitename>\n  </siteinfo>\n"
+    )
+    with open(dump_path, "wb") as out, open(expected_path, "w", encoding="utf-8") as expected:
+        out.write(bz2.compress(header.encode("utf-8")))
+        for first_id in range(1, pages + 1, PAGES_PER_STREAM):
+            offset = out.tell()
+            body = []
+            for page_id in range(first_id, min(pages + 1, first_id + PAGES_PER_STREAM)):
+                kind = rng.random()
+                if kind < 0.8:
+                    name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"
+                    if name in used_names:
+                        name = f"{name} ({rng.choice(_OCCUPATIONS)}, {page_id})"
+                    used_names.add(name)
+                    title = name
+                    text, planted = _article(rng, name, max(1, int(rng.gauss(filler, filler / 3))))
+                    body.append(_page_xml(page_id, name, text))
+                    if rng.random() < notable_fraction:
+                        notable.append(name)
+                        expected.write(json.dumps({"name": name, "residence_sentences": planted}) + "\n")
+                elif kind < 0.88:
+                    title = f"{rng.choice(_LAST)} family {page_id}"
+                    body.append(_page_xml(page_id, title, f"#REDIRECT [[{rng.choice(_LAST)}]]", redirect=title))
+                elif kind < 0.94:
+                    title = f"Talk:{rng.choice(_CITIES)} {page_id}"
+                    body.append(_page_xml(page_id, title, "Discussion about sources. ~~~~", ns=1))
+                else:
+                    city = rng.choice(_CITIES)
+                    title = f"{city} Botanical Garden {page_id}"
+                    text = f"The '''{title}''' is a garden in [[{city}]]. It opened in {rng.randint(1800, 1990)}."
+                    body.append(_page_xml(page_id, title, text))
+                index_lines.append(f"{offset}:{page_id}:{title}")
+            out.write(bz2.compress("".join(body).encode("utf-8")))
+        out.write(bz2.compress(b"</mediawiki>\n"))
+
+    with bz2.open(index_path, "wt", encoding="utf-8") as f:
+        f.write("\n".join(index_lines) + "\n")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name"])
+        writer.writerows([name.replace(" ", "_")] for name in notable)
+
+    return {
+        "dump": str(dump_path),
+        "index": str(index_path),
+        "notable_csv": str(csv_path),
+        "expected": str(expected_path),
+        "pages": pages,
+        "notable": len(notable),
+        "compressed_bytes": dump_path.stat().st_size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic multistream dump and notable CSV.")
+    parser.add_argument("output", type=Path, help="Dump path, e.g. wiki_dumps/synthetic-multistream.xml.bz2.")
+    parser.add_argument("--pages", type=int, default=10000, help="Pages in the dump (default: 10000).")
+    parser.add_argument(
+        "--notable-fraction", type=float, default=0.2, help="Share of biographies listed as notable (default: 0.2)."
+    )
+    parser.add_argument("--filler", type=int, default=30, help="Mean non-residence sentences per biography (default: 30).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+    info = write_dump(args.output, args.pages, args.notable_fraction, args.filler, args.seed)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
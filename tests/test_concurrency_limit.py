@@ -0,0 +1,72 @@
+"""Checks that AdaptiveLimiter grows while latency holds, shrinks when it rises and stays within its bounds."""
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from concurrency_limit import AdaptiveLimiter
+
+
+def _feed(limiter: AdaptiveLimiter, latencies, failed: bool = False) -> None:
+    async def run() -> None:
+        for latency in latencies:
+            # Every sample closes a round: make the last round look one short average old
+            limiter._round_start -= 1e6
+            await limiter.acquire()
+            await limiter.release(latency, failed)
+
+    asyncio.run(run())
+
+
+def test_grows_to_max_at_steady_latency():
+    limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=16)
+    _feed(limiter, [0.1] * 50)
+    assert limiter.current == 16
+    steps = [limit for _, limit in limiter.history]
+    assert steps == sorted(steps) and steps[-1] == 16
+
+
+def test_shrinks_when_latency_rises_but_not_below_min():
+    limiter = AdaptiveLimiter(initial=16, min_limit=6, max_limit=16)
+    _feed(limiter, [0.1] * 5)
+    assert limiter.current == 16
+    _feed(limiter, [0.1 * 2 ** i for i in range(1, 30)])
+    steps = [limit for _, limit in limiter.history]
+    assert steps == sorted(steps, reverse=True) and limiter.current == 6
+
+
+def test_failure_halves_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial=16, min_limit=2, max_limit=16, cooldown=60.0)
+    _feed(limiter, [None], failed=True)
+    assert limiter.current == 8
+    _feed(limiter, [None] * 3, failed=True)
+    assert limiter.current == 8
+    assert limiter.failed == 4
+    limiter.cooldown = 0.0
+    _feed(limiter, [None] * 5, failed=True)
+    assert limiter.current == 2
+
+
+def test_fixed_limit_never_moves():
+    limiter = AdaptiveLimiter(initial=4, min_limit=4, max_limit=4)
+    _feed(limiter, [0.1] * 10 + [5.0] * 10)
+    _feed(limiter, [None], failed=True)
+    assert limiter.current == 4 and limiter.history == []
+
+
+def test_initial_is_clamped():
+    assert AdaptiveLimiter(initial=100, min_limit=1, max_limit=8).current == 8
+    assert AdaptiveLimiter(initial=0, min_limit=2, max_limit=8).current == 2
+
+
+def test_doubled_latency_shrinks_small_limit():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=32)
+    _feed(limiter, [0.1])
+    _feed(limiter, [0.2] * 20)
+    assert limiter.current < 4
+    assert limiter.history[-1][1] == limiter.current
@@ -14,7 +14,7 @@ from typing import List, Tuple
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT))
 
-from llm_processing import LLM_PRIMARY_MODEL, _call_llm
+from llm_processing import LLM_CONCURRENCY_MAX, LLM_PRIMARY_MODEL, _call_llm, close_pool, configure_concurrency
 
 
 def _default_output_path() -> Path:
@@ -54,6 +54,7 @@ async def run_batch(
     output_path: Path,
     model_name: str,
     concurrency: int = 5,
+    max_concurrency: int = LLM_CONCURRENCY_MAX,
 ) -> None:
     """Send up to `count` LLM requests from the provided input file and persist JSONL output."""
     cases = _load_cases(input_path, count)
@@ -61,14 +62,14 @@ async def run_batch(
         print(f"No cases found in {input_path} to process.")
         return
 
-    semaphore = asyncio.Semaphore(concurrency)
-
-    async def bound_call(person: str, sentences: List[str]):
-        async with semaphore:
-            return await _run_single(person, sentences, model_name)
-
-    tasks = [asyncio.create_task(bound_call(person, sentences)) for person, sentences in cases]
-    results = await asyncio.gather(*tasks)
+    # Requests start at `concurrency` in flight and adapt up to `max_concurrency`
+    limiter = configure_concurrency(concurrency, max_limit=max_concurrency)
+    tasks = [asyncio.create_task(_run_single(person, sentences, model_name)) for person, sentences in cases]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        await close_pool()
+    print(f"Concurrency limit ended at {limiter.current} (bounds {limiter.min_limit}-{limiter.max_limit}).")
 
     with output_path.open("w", encoding="utf-8") as outfile:
         for person, residences in results:
@@ -103,7 +104,13 @@ def main() -> None:
         "--concurrency",
         type=int,
         default=5,
-        help="Max concurrent requests to the LLM (default: 5).",
+        help="Initial concurrent requests to the LLM (default: 5).",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=LLM_CONCURRENCY_MAX,
+        help="Upper bound for the adaptive concurrency limit; equal to --concurrency fixes it (default: LLM_CONCURRENCY_MAX).",
     )
     args = parser.parse_args()
 
@@ -115,7 +122,7 @@ def main() -> None:
         f"-> {output_path} using model '{args.model}' (concurrency={args.concurrency})..."
     )
     t0 = time.time()
-    asyncio.run(run_batch(input_path, args.count, output_path, args.model, args.concurrency))
+    asyncio.run(run_batch(input_path, args.count, output_path, args.model, args.concurrency, args.max_concurrency))
     elapsed = time.time() - t0
     print(f"Done in {elapsed:.2f}s.")
 
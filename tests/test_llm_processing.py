@@ -0,0 +1,85 @@
+"""Checks for the LLM stage's pure helpers."""
+from __future__ import annotations
+
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from llm_processing import GroundingIndex, _json_end_detector, _merge_residences, _normalize_text
+from time_grounding import _legacy_grounded, _synthetic_person
+
+
+def test_grounding_index_matches_legacy_scan():
+    rng = random.Random(3)
+    for _ in range(20):
+        sentences, evidence = _synthetic_person(rng, 60, 30)
+        index = GroundingIndex(sentences)
+        for evid in evidence:
+            evid_norm = _normalize_text(evid)
+            assert (index.locate(evid_norm) is not None) == _legacy_grounded(evid_norm, sentences)
+
+
+def test_grounding_index_points_at_first_matching_sentence():
+    index = GroundingIndex(["She lived in Paris.", "Later she lived in Vienna.", "She lived in Paris again."])
+    assert index.locate(_normalize_text("lived in Vienna")) == 1
+    assert index.locate(_normalize_text("lived in Paris")) == 0
+    assert index.locate(_normalize_text("Later, she lived in Vienna")) == 1
+    assert index.locate(_normalize_text("sailed to Atlantis")) is None
+    assert GroundingIndex([]).locate("paris") is None
+
+
+def _entry(residence: str, time_span: str, evidence: str = "") -> dict:
+    return {"residence": residence, "time_span": time_span, "evidence": evidence}
+
+
+def test_merge_widens_overlapping_spans_of_same_place():
+    merged = _merge_residences([
+        [_entry("Paris", "1900-1910", "first")],
+        [_entry("paris", "1905-1920", "second"), _entry("Vienna", "1921")],
+    ])
+    assert merged == [_entry("Paris", "1900-1920", "first"), _entry("Vienna", "1921")]
+
+
+def test_merge_keeps_disjoint_spans_and_other_places():
+    chunks = [[_entry("Paris", "1900-1905")], [_entry("Paris", "1930-1940"), _entry("Berlin", "1900-1905")]]
+    assert _merge_residences(chunks) == [e for chunk in chunks for e in chunk]
+
+
+def test_merge_spans_without_years_only_match_identical_spans():
+    merged = _merge_residences([
+        [_entry("Paris", "childhood"), _entry("Paris", "Childhood"), _entry("Paris", "later life")],
+        [_entry("Paris", "1900")],
+    ])
+    assert [e["time_span"] for e in merged] == ["childhood", "later life", "1900"]
+
+
+def test_merge_does_not_modify_input():
+    first = _entry("Paris", "1900-1910")
+    _merge_residences([[first], [_entry("Paris", "1905-1920")]])
+    assert first["time_span"] == "1900-1910"
+
+
+def _feed_all(chunks) -> list:
+    feed = _json_end_detector()
+    return [feed(chunk) for chunk in chunks]
+
+
+def test_json_end_detected_on_closing_chunk():
+    assert _feed_all(['{"a": [1, ', '{"b": 2}', '], "c": 3', '}', " trailing"]) == [False, False, False, True, False]
+    assert _feed_all(['[{"residence": "Paris"}]']) == [True]
+
+
+def test_json_end_ignores_brackets_in_strings():
+    assert _feed_all(['{"a": "}]', '\\" }', '"', "}"]) == [False, False, False, True]
+
+
+def test_truncated_json_never_ends():
+    text = '{"Ada Lovelace": [{"residence": "London", "evidence": "She lived in {London"}'
+    for cut in range(len(text)):
+        assert not any(_feed_all([text[:cut]]))
+    assert not any(_feed_all(list(text)))
@@ -0,0 +1,63 @@
+"""Checks that an LLM pass with failed requests is not marked complete and a resume redoes only those records."""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import llm_processing
+from checkpoint import _progress_path, _stage_path
+from fake_ollama import StubOllama
+
+_RECORDS = [
+    {"name": "Ada Lovelace", "residence_sentences": ["In 1835 she moved to Ockham Park with her husband."]},
+    {"name": "Alan Turing", "residence_sentences": []},
+    {"name": "Grace Hopper", "residence_sentences": ["In 1934 she lived in New Haven while studying at Yale."]},
+    {"name": "Marie Curie", "residence_sentences": ["In 1891 she moved to Paris to study physics."]},
+]
+
+
+def _run(stub: StubOllama, input_path: Path, output_path: Path, resume: bool = True) -> None:
+    asyncio.run(
+        llm_processing.process_with_llm(
+            str(input_path), str(output_path), resume=resume, concurrency=2, cache_mode="bypass", hosts=stub.url
+        )
+    )
+
+
+def test_failed_records_are_redone_on_resume(tmp_path):
+    input_path = tmp_path / "residences.jsonl"
+    input_path.write_text("".join(json.dumps(r) + "\n" for r in _RECORDS), encoding="utf-8")
+    expected_path = tmp_path / "expected.jsonl"
+    output_path = tmp_path / "structured.jsonl"
+    stub = StubOllama(latency=0.0).start()
+    try:
+        _run(stub, input_path, expected_path, resume=False)
+        expected = expected_path.read_text(encoding="utf-8")
+        assert len(expected.splitlines()) == 3
+
+        stub.failure_rate = 1.0
+        _run(stub, input_path, output_path)
+        assert output_path.read_text(encoding="utf-8") == ""
+        assert not _stage_path(output_path).exists()
+        progress = json.loads(_progress_path(output_path).read_text(encoding="utf-8"))
+        assert progress["records"] == 4 and progress["failed"] == [1, 3, 4]
+
+        stub.failure_rate = 0.0
+        before = stub.requests
+        _run(stub, input_path, output_path)
+        assert stub.requests - before == 3
+        assert output_path.read_text(encoding="utf-8") == expected
+        assert _stage_path(output_path).exists() and not _progress_path(output_path).exists()
+
+        before = stub.requests
+        _run(stub, input_path, output_path)
+        assert stub.requests == before
+    finally:
+        stub.stop()
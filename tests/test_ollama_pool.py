@@ -0,0 +1,72 @@
+"""Checks EndpointPool ejection, failover and re-admission against stub Ollama servers."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from fake_ollama import StubOllama
+from ollama_pool import EndpointPool, RETRYABLE_ERRORS
+
+_MESSAGES = [{"role": "user", "content": "Person: Ada Lovelace\n- In 1835 she moved to Ockham Park."}]
+
+
+async def _hosts(pool: EndpointPool, requests: int) -> list:
+    """Host that answered each of `requests` sequential requests (None for a request that failed everywhere)."""
+    hosts = []
+    try:
+        for _ in range(requests):
+            try:
+                _, endpoint = await pool.chat(messages=_MESSAGES)
+                hosts.append(endpoint.host)
+            except RETRYABLE_ERRORS:
+                hosts.append(None)
+    finally:
+        await pool.close()
+    return hosts
+
+
+def test_failover_ejection_and_readmission(capsys):
+    good, bad = StubOllama(latency=0.0).start(), StubOllama(latency=0.0, failure_rate=1.0).start()
+    try:
+        pool = EndpointPool([(bad.url, "m"), (good.url, "m")], cooldown=1.0)
+        flaky = pool.endpoints[0]
+
+        # Every request fails over to the good host; the bad one is ejected after two failures
+        assert asyncio.run(_hosts(pool, 6)) == [good.url] * 6
+        assert bad.requests == 2 and not flaky.healthy(time.monotonic())
+        assert capsys.readouterr().out.count("ejecting") == 1
+
+        # Once its cooldown has passed and it answers again, the host is re-admitted with a fresh backoff
+        bad.failure_rate = 0.0
+        time.sleep(max(0.0, flaky.ejected_until - time.monotonic()) + 0.05)
+        assert asyncio.run(_hosts(pool, 1)) == [bad.url]
+        assert flaky.ejections == 0 and flaky.healthy(time.monotonic())
+        assert "re-admitting" in capsys.readouterr().out
+        assert pool.report()[0]["ejections"] == 1
+    finally:
+        good.stop()
+        bad.stop()
+
+
+def test_ejected_endpoint_still_used_when_none_is_healthy(capsys):
+    stub = StubOllama(latency=0.0, failure_rate=1.0).start()
+    try:
+        pool = EndpointPool([(stub.url, "m")], cooldown=60.0)
+        assert asyncio.run(_hosts(pool, 8)) == [None] * 8
+        assert stub.requests == 8
+        # Repeat ejections while already ejected back off further but are not logged again
+        assert capsys.readouterr().out.count("ejecting") == 1
+        assert pool.endpoints[0].ejections == 4
+
+        stub.failure_rate = 0.0
+        assert asyncio.run(_hosts(pool, 1)) == [stub.url]
+        assert pool.endpoints[0].ejections == 0 and pool.endpoints[0].healthy(time.monotonic())
+    finally:
+        stub.stop()
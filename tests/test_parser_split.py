@@ -0,0 +1,49 @@
+"""Checks that splitting a multistream dump into byte ranges loses or repeats no page."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from parser import iter_wiki_pages, split_dump
+from synthetic_dump import NS_URI, write_dump
+
+
+def _pages(dump_path: Path, ranges) -> list:
+    return [page for start, end in ranges for page in iter_wiki_pages(str(dump_path), NS_URI, start, end)]
+
+
+def _dump(tmp_path: Path) -> Path:
+    dump_path = tmp_path / "synthetic-multistream.xml.bz2"
+    write_dump(dump_path, pages=1200, filler=5)
+    return dump_path
+
+
+def test_ranges_cover_every_page_once(tmp_path):
+    dump_path = _dump(tmp_path)
+    whole = _pages(dump_path, [(0, None)])
+    assert len(whole) > 500
+    for parts in (2, 4, 7):
+        ranges = split_dump(str(dump_path), parts)
+        assert len(ranges) > 1
+        assert ranges[0][0] == 0 and ranges[-1][1] is None
+        assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+        assert _pages(dump_path, ranges) == whole
+
+
+def test_scan_matches_index(tmp_path):
+    dump_path = _dump(tmp_path)
+    with_index = split_dump(str(dump_path), 4)
+    (tmp_path / "synthetic-multistream-index.txt.bz2").unlink()
+    assert split_dump(str(dump_path), 4) == with_index
+
+
+def test_single_stream_dump_is_one_range(tmp_path):
+    dump_path = _dump(tmp_path)
+    plain = dump_path.rename(tmp_path / "synthetic.xml.bz2")
+    assert split_dump(str(plain), 4) == [(0, None)]
+
@@ -0,0 +1,92 @@
+"""Checks for the parsed-JSONL title index: writing, merging across shards and random-access lookup."""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from parser import (
+    iter_indexed_lines,
+    load_title_index,
+    merge_title_indexes,
+    parse_wiki_dump,
+    split_dump,
+    title_index_path,
+)
+from synthetic_dump import NS_URI, write_dump
+
+
+def _write_shard(path: Path, titles) -> None:
+    """A parsed shard and its index, in the format parse_wiki_dump writes."""
+    offset = 0
+    with open(path, "w", encoding="utf-8") as out, open(title_index_path(path), "w", encoding="utf-8") as index:
+        for title in titles:
+            line = json.dumps({"title": title, "text": f"About {title}, née Ünal."}) + "\n"
+            out.write(line)
+            index.write(f"{title.upper()}\t{offset}\t{len(line)}\n")
+            offset += len(line)
+        index.write(f"#bytes\t{offset}\n")
+
+
+def _combine(shards, combined: Path) -> None:
+    merge_title_indexes(shards, combined)
+    with open(combined, "wb") as out:
+        for shard in shards:
+            out.write(shard.read_bytes())
+
+
+def test_merge_rebases_offsets_and_removes_shard_indexes(tmp_path):
+    shards = [tmp_path / f"shard.{i}.jsonl" for i in range(3)]
+    _write_shard(shards[0], ["Ada Lovelace", "Alan Turing"])
+    _write_shard(shards[1], [])
+    _write_shard(shards[2], ["Grace Hopper"])
+    combined = tmp_path / "combined.jsonl"
+    _combine(shards, combined)
+
+    assert not any(os.path.exists(title_index_path(shard)) for shard in shards)
+    lines = combined.read_text(encoding="utf-8").splitlines(keepends=True)
+    entries = load_title_index(str(combined))
+    assert [length for _, length in entries] == [len(line) for line in lines]
+    assert list(iter_indexed_lines(str(combined), entries)) == lines
+
+
+def test_lookup_returns_wanted_titles_in_file_order(tmp_path):
+    shard = tmp_path / "shard.jsonl"
+    _write_shard(shard, ["Ada Lovelace", "Alan Turing", "Grace Hopper"])
+    entries = load_title_index(str(shard), {"GRACE HOPPER", "ADA LOVELACE", "NOBODY"})
+    titles = [json.loads(line)["title"] for line in iter_indexed_lines(str(shard), entries)]
+    assert titles == ["Ada Lovelace", "Grace Hopper"]
+    assert list(iter_indexed_lines(str(shard), [])) == []
+
+
+def test_missing_or_stale_index_is_ignored(tmp_path):
+    shard = tmp_path / "shard.jsonl"
+    _write_shard(shard, ["Ada Lovelace"])
+    with open(shard, "a", encoding="utf-8") as f:
+        f.write("{}\n")
+    assert load_title_index(str(shard)) is None
+    os.remove(title_index_path(shard))
+    assert load_title_index(str(shard)) is None
+
+
+def test_index_of_parsed_shards_reads_back_records(tmp_path):
+    dump_path = tmp_path / "synthetic-multistream.xml.bz2"
+    write_dump(dump_path, pages=600, filler=5)
+    shards = []
+    for i, (start, end) in enumerate(split_dump(str(dump_path), 3)):
+        shard = tmp_path / f"shard.{i}.jsonl"
+        parse_wiki_dump(str(dump_path), str(shard), start, end, NS_URI)
+        shards.append(shard)
+    combined = tmp_path / "combined.jsonl"
+    _combine(shards, combined)
+
+    records = [json.loads(line) for line in combined.read_text(encoding="utf-8").splitlines()]
+    wanted = {r["title"].upper() for r in records[::10]}
+    lines = iter_indexed_lines(str(combined), load_title_index(str(combined), wanted))
+    assert [json.loads(line) for line in lines] == [r for r in records if r["title"].upper() in wanted]
@@ -0,0 +1,67 @@
+"""Compare the fp32 and int8 residence classifier backends: load time, sentences/s and disagreements."""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from classifier_artifact import MODEL_DIR, load_model
+from quantized_embedder import QUANTIZED_DIR, agreement, load_quantized
+
+
+def _load_sentences(path: Path, limit: int, seed: int) -> List[str]:
+    """Sentences from train_data.jsonl-style ({"text": ...}) or extractor output ({"residence_sentences": [...]})."""
+    sentences = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "text" in record:
+                sentences.append(record["text"])
+            else:
+                sentences.extend(record.get("residence_sentences", []))
+    random.Random(seed).shuffle(sentences)
+    return sentences[:limit]
+
+
+def _time_backend(load: Any, sentences: List[str], batch_size: int) -> Tuple[Tuple[Any, Any], Dict[str, float]]:
+    t0 = time.perf_counter()
+    model = load()
+    load_seconds = time.perf_counter() - t0
+    embedder, clf = model
+    t0 = time.perf_counter()
+    clf.predict_proba(embedder.encode(sentences, batch_size=batch_size, show_progress_bar=False))
+    seconds = time.perf_counter() - t0
+    return model, {"load_s": round(load_seconds, 2), "sentences_per_s": round(len(sentences) / seconds, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the fp32 and int8 classifier backends on the same sentences.")
+    parser.add_argument("--input", type=Path, default=ROOT / "train_data.jsonl", help="JSONL of sentences (default: train_data.jsonl).")
+    parser.add_argument("--limit", type=int, default=5000, help="Sentences to score (default: 5000).")
+    parser.add_argument("--batch-size", type=int, default=256, help="Sentences per encode call (default: 256).")
+    parser.add_argument("--model", type=Path, default=MODEL_DIR, help="fp32 artifact directory (default: residence_classifier).")
+    parser.add_argument("--int8-dir", type=Path, default=QUANTIZED_DIR, help="int8 export directory.")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffle seed for picking sentences (default: 0).")
+    args = parser.parse_args()
+
+    sentences = _load_sentences(args.input, args.limit, args.seed)
+    print(f"Scoring {len(sentences)} sentences from {args.input}")
+    fp32, fp32_stats = _time_backend(lambda: load_model(args.model), sentences, args.batch_size)
+    int8, int8_stats = _time_backend(lambda: load_quantized(args.int8_dir), sentences, args.batch_size)
+    print(f"fp32: {fp32_stats}")
+    print(f"int8: {int8_stats}  ({int8_stats['sentences_per_s'] / fp32_stats['sentences_per_s']:.2f}x)")
+    print(f"agreement: {agreement(fp32, int8, sentences, batch_size=args.batch_size)}")
+
+
+if __name__ == "__main__":
+    main()
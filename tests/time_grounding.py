@@ -0,0 +1,97 @@
+"""Micro-benchmark: evidence grounding with GroundingIndex vs the old per-entry sentence scan."""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from llm_processing import GroundingIndex, _normalize_text
+
+_WORDS = (
+    "moved lived settled returned family house years later city village studied worked married "
+    "estate apartment uncle mother father brother school university court palace harbour winter summer"
+).split()
+_PLACES = ["Paris", "Vienna", "Boston", "Berlin", "Lagos", "Lima", "Kyoto", "Prague", "Dublin", "Quebec"]
+
+
+def _legacy_grounded(evid_norm: str, sentences: list[str]) -> bool:
+    """The check _normalize_residence_entry ran per entry before the index existed."""
+    sentence_norms = [_normalize_text(s) for s in sentences]
+    found_in_source = any(evid_norm in s for s in sentence_norms)
+    if not found_in_source:
+        evid_tokens = [t for t in evid_norm.split() if len(t) > 2]
+        for s in sentence_norms:
+            if not evid_tokens:
+                break
+            overlap = sum(1 for t in evid_tokens if t in s.split())
+            if overlap >= max(1, int(0.6 * len(evid_tokens))):
+                found_in_source = True
+                break
+    return found_in_source
+
+
+def _synthetic_person(rng: random.Random, n_sentences: int, n_entries: int):
+    sentences = []
+    for i in range(n_sentences):
+        words = rng.choices(_WORDS, k=rng.randint(12, 30))
+        words.insert(rng.randrange(len(words)), f"in {rng.choice(_PLACES)} in {1800 + i % 200}")
+        sentences.append("In " + " ".join(words) + ".")
+    evidence = []
+    for _ in range(n_entries):
+        source = rng.choice(sentences).split()
+        kind = rng.random()
+        if kind < 0.5:  # verbatim snippet
+            start = rng.randrange(len(source) // 2)
+            evidence.append(" ".join(source[start:start + rng.randint(5, 12)]))
+        elif kind < 0.8:  # paraphrase: same words, reshuffled
+            picked = rng.sample(source, min(len(source), 8))
+            evidence.append(" ".join(picked))
+        else:  # not grounded
+            evidence.append(" ".join(rng.choices(_WORDS, k=3) + ["sailed", "toward", "distant", "Atlantis", "alone"]))
+    return sentences, evidence
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time evidence grounding for one person's residence entries.")
+    parser.add_argument("--sentences", type=int, default=300, help="Residence sentences per person (default: 300).")
+    parser.add_argument("--entries", type=int, default=40, help="Extracted residences per person (default: 40).")
+    parser.add_argument("--people", type=int, default=20, help="People to time (default: 20).")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    people = [_synthetic_person(rng, args.sentences, args.entries) for _ in range(args.people)]
+    evid_norms = [[_normalize_text(e) for e in evidence] for _, evidence in people]
+
+    t0 = time.perf_counter()
+    before = [[_legacy_grounded(e, sentences) for e in norms] for (sentences, _), norms in zip(people, evid_norms)]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    after = []
+    for (sentences, _), norms in zip(people, evid_norms):
+        index = GroundingIndex(sentences)
+        after.append([index.locate(e) is not None for e in norms])
+    indexed_s = time.perf_counter() - t0
+
+    if before != after:
+        raise SystemExit("GroundingIndex disagrees with the legacy check")
+    checks = args.people * args.entries
+    grounded = sum(map(sum, after))
+    print(
+        f"{args.people} people x {args.sentences} sentences x {args.entries} entries "
+        f"({grounded}/{checks} grounded, decisions identical)"
+    )
+    print(f"legacy scan:     {legacy_s * 1000:8.1f} ms ({legacy_s / checks * 1e6:.1f} us/entry)")
+    print(f"GroundingIndex:  {indexed_s * 1000:8.1f} ms ({indexed_s / checks * 1e6:.1f} us/entry, index build included)")
+    print(f"speedup:         {legacy_s / max(indexed_s, 1e-9):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
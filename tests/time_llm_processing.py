@@ -11,6 +11,7 @@ ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
+from llm_cache import CACHE_MODES
 from llm_processing import process_with_llm
 
 
@@ -28,13 +29,20 @@ def main() -> None:
         default=Path("structured_residences_2.jsonl"),
         help="Output JSONL for structured residences (default: structured_residences_2.jsonl).",
     )
+    parser.add_argument(
+        "--cache-mode",
+        choices=CACHE_MODES,
+        default="bypass",
+        help="LLM response cache mode (default: bypass, so every request reaches the model).",
+    )
     args = parser.parse_args()
 
     t0 = time.time()
     print(f"Running llm_processing: input={args.input}, output={args.output} ...")
     import asyncio
 
-    asyncio.run(process_with_llm(str(args.input), str(args.output)))
+    # Never resume: a finished output would otherwise time an "up to date" skip
+    asyncio.run(process_with_llm(str(args.input), str(args.output), resume=False, cache_mode=args.cache_mode))
     elapsed = time.time() - t0
     print(f"Done in {elapsed:.2f}s. Output: {args.output}")
 
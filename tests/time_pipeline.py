@@ -0,0 +1,236 @@
+"""Offline end-to-end benchmark: synthetic dump -> parse -> extract -> LLM (stub server), reported as JSON."""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+TESTS = Path(__file__).resolve().parent
+if str(TESTS) not in sys.path:
+    sys.path.append(str(TESTS))
+
+# Every run starts cold: no sentence score cache, no cached LLM replies
+os.environ["EXTRACT_SCORE_CACHE"] = ""
+os.environ["LLM_CACHE_MODE"] = "bypass"
+
+from fake_ollama import StubOllama
+from synthetic_dump import write_dump
+
+STAGES = ("parse", "extract", "llm")
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / (1024 * 1024)
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def _line_count(path: Path) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def _parse_stage(dump: str, output: str, notable_csv: str, workers: int) -> Dict[str, Any]:
+    from extractor import load_famous_name_map
+    from main import combine_files
+    from parser import find_namespace, merge_title_indexes, parse_wiki_dump, split_dump
+
+    allowed = frozenset(load_famous_name_map(notable_csv))
+    ns_uri = find_namespace(dump)
+    ranges = split_dump(dump, workers)
+    parts = [f"{output}.{idx:05d}" for idx in range(len(ranges))]
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        pool.starmap(parse_wiki_dump, [(dump, part, start, end, ns_uri, allowed) for part, (start, end) in zip(parts, ranges)])
+    merge_title_indexes(parts, output)
+    combine_files(parts, output)
+    return {"seconds": time.perf_counter() - t0, "ranges": len(ranges), "articles": _line_count(Path(output))}
+
+
+def _extract_stage(parsed: str, output: str, notable_csv: str, model: str) -> Dict[str, Any]:
+    import extractor
+
+    extractor._MODEL_DIR = extractor._MODEL_PATH = Path(model)  # an artifact directory or an older .joblib
+    extractor._load_model()  # not part of the timed work
+    t0 = time.perf_counter()
+    extractor.process_pages(parsed, output, notable_csv, resume=False)
+    seconds = time.perf_counter() - t0
+    scored = extractor._EMBED_STATS["sentences"] + extractor._EMBED_STATS["prefiltered"]
+    return {
+        "seconds": seconds,
+        "articles": _line_count(Path(output)),
+        "sentences": scored,
+        "embedded": extractor._EMBED_STATS["sentences"],
+        "embed_seconds": extractor._EMBED_STATS["seconds"],
+        "backend": "int8" if extractor._use_quantized() else "fp32",
+    }
+
+
+def _llm_stage(records: str, output: str, host: str, concurrency: int, max_concurrency: int) -> Dict[str, Any]:
+    import asyncio
+
+    import llm_processing
+
+    t0 = time.perf_counter()
+    asyncio.run(
+        llm_processing.process_with_llm(
+            records, output, resume=False, concurrency=concurrency, hosts=host, max_concurrency=max_concurrency
+        )
+    )
+    seconds = time.perf_counter() - t0
+    latencies = sorted(llm_processing._LATENCIES)
+
+    def percentile(q: float) -> Optional[float]:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else None
+
+    stats = llm_processing._LLM_STATS
+    return {
+        "seconds": seconds,
+        "records": _line_count(Path(records)),
+        "residences": _line_count(Path(output)),
+        "requests": stats["requests"],
+        "failed_requests": stats["errors"],
+        "timeouts": stats["timeouts"],
+        "latency_p50_s": percentile(0.50),
+        "latency_p99_s": percentile(0.99),
+    }
+
+
+def _stage_entry(fn: Callable[..., Dict[str, Any]], args: tuple, results: Any) -> None:
+    try:
+        report = fn(*args)
+        report.update(_peak_rss_mb())
+        results.put(report)
+    except BaseException as exc:
+        results.put({"error": f"{type(exc).__name__}: {exc}"})
+        raise
+
+
+def _run_isolated(fn: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+    """Run one stage in a fresh process so its peak RSS and warm-up are its own."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_stage_entry, args=(fn, args, results))
+    process.start()
+    report = results.get()
+    process.join()
+    if "error" in report:
+        raise SystemExit(f"{fn.__name__} failed: {report['error']}")
+    return report
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parse/extract/LLM offline on a synthetic dump.")
+    parser.add_argument("--workdir", type=Path, default=Path("bench_work"), help="Scratch directory (default: bench_work).")
+    parser.add_argument("--report", type=Path, default=Path("bench_report.json"), help="JSON report path (default: bench_report.json).")
+    parser.add_argument("--pages", type=int, default=20000, help="Pages in the synthetic dump (default: 20000).")
+    parser.add_argument("--notable-fraction", type=float, default=0.2, help="Share of biographies that are notable (default: 0.2).")
+    parser.add_argument("--filler", type=int, default=30, help="Mean non-residence sentences per biography (default: 30).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the dump and the stub's failures (default: 0).")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run (default: parse,extract,llm).")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1, help="Parse processes (default: CPU count).")
+    parser.add_argument(
+        "--model",
+        type=Path,
+        default=ROOT / "residence_classifier",
+        help="Classifier artifact directory, or an older .joblib, for the extract stage (default: residence_classifier).",
+    )
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub seconds per request (default: 0.2).")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Stub seconds per output token (default: 0).")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of stub requests that fail (default: 0).")
+    parser.add_argument("--slots", type=int, default=4, help="Requests the stub serves at once (default: 4).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Initial LLM concurrency (default: 4).")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Upper bound for LLM concurrency (default: 16).")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"unknown stages: {', '.join(sorted(unknown))}")
+    if "extract" in stages and not args.model.exists():
+        raise SystemExit(f"{args.model} not found; train it (train_classifier.py) or drop the extract stage")
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    dump = args.workdir / "synthetic-multistream.xml.bz2"
+    parsed = args.workdir / "wiki_articles.jsonl"
+    extracted = args.workdir / "classifier_output_residences.jsonl"
+    structured = args.workdir / "structured_residences.jsonl"
+
+    t0 = time.perf_counter()
+    dump_info = write_dump(dump, args.pages, args.notable_fraction, args.filler, args.seed)
+    print(f"Generated {args.pages} pages ({dump_info['notable']} notable) in {time.perf_counter() - t0:.1f}s")
+
+    report: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "dump": dump_info,
+        "stages": {},
+    }
+
+    if "parse" in stages:
+        result = _run_isolated(_parse_stage, str(dump), str(parsed), dump_info["notable_csv"], args.parse_workers)
+        result["pages_per_s"] = args.pages / result["seconds"]
+        result["compressed_mb_per_s"] = dump_info["compressed_bytes"] / (1 << 20) / result["seconds"]
+        report["stages"]["parse"] = result
+
+    if "extract" in stages:
+        if not parsed.exists():
+            raise SystemExit(f"{parsed} not found; include the parse stage")
+        result = _run_isolated(_extract_stage, str(parsed), str(extracted), dump_info["notable_csv"], str(args.model))
+        result["sentences_per_s"] = result["sentences"] / result["seconds"]
+        report["stages"]["extract"] = result
+
+    if "llm" in stages:
+        # Without the extract stage, the LLM gets the residence sentences the generator planted
+        records = extracted if "extract" in stages else Path(dump_info["expected"])
+        stub = StubOllama(
+            latency=args.latency,
+            token_latency=args.token_latency,
+            failure_rate=args.failure_rate,
+            slots=args.slots,
+            seed=args.seed,
+        ).start()
+        try:
+            result = _run_isolated(
+                _llm_stage, str(records), str(structured), stub.url, args.concurrency, args.max_concurrency
+            )
+        finally:
+            stub.stop()
+        result["input"] = str(records)
+        result["records_per_s"] = result["records"] / result["seconds"]
+        result["stub_requests"] = stub.requests
+        result["stub_failures"] = stub.failures
+        report["stages"]["llm"] = result
+
+    args.report.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(json.dumps(report["stages"], indent=2))
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
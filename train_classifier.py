@@ -1,11 +1,22 @@
 import json
+import os
+import shutil
 import joblib
-from pathlib import Path
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
 
+from classifier_artifact import MODEL_DIR, save_model
+from prefilter import DEFAULT_RECALL_TARGET, PREFILTER_PATH, prefilter_mask, train_prefilter
+from quantized_embedder import QUANTIZED_DIR, agreement, export_quantized, load_quantized
+
+# Recall the lexical prefilter must keep on residence sentences (lower = more sentences skip embedding)
+PREFILTER_RECALL = float(os.getenv("PREFILTER_RECALL", str(DEFAULT_RECALL_TARGET)))
+# EXPORT_INT8=1 also writes the int8 ONNX backend for CPU extraction (needs onnxruntime and torch)
+EXPORT_INT8 = os.getenv("EXPORT_INT8", "0") == "1"
+
 # 1. Prepare sample dataset in a JSONL file: train_data.jsonl
 # 2. Load data from JSONL file
 texts = []
@@ -22,8 +33,8 @@ embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 X_embeddings = embedder.encode(texts, show_progress_bar=False)
 
 # 4. Train/test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X_embeddings, labels, test_size=0.3, random_state=42
+X_train, X_test, y_train, y_test, texts_train, texts_test = train_test_split(
+    X_embeddings, labels, texts, test_size=0.3, random_state=42
 )
 
 # 5. Train logistic regression classifier
@@ -40,7 +51,39 @@ print(f"F1 Score: {f1:.2f}")
 print("Confusion Matrix:")
 print(conf_mat)
 
-# 7. Save model and embedder pipeline next to this script
-model_path = Path(__file__).resolve().parent / "residence_classifier.joblib"
-joblib.dump((embedder, clf), model_path)
-print(f"Model and embedding pipeline saved to {model_path}")
+# 7. Save the embedder weights and classifier coefficients next to this script
+save_model(embedder, clf, MODEL_DIR)
+print(f"Model and embedding pipeline saved to {MODEL_DIR}")
+
+# 8. Train the lexical prefilter on the same split and report what the cascade costs
+prefilter = train_prefilter(texts_train, y_train, PREFILTER_RECALL)
+passed = prefilter_mask(prefilter, texts_test)
+is_pos = np.asarray(y_test) == 1
+clf_pos = np.asarray(y_pred) == 1
+cascade_pos = clf_pos & passed
+n_pos = max(1, int(is_pos.sum()))
+clf_recall = (clf_pos & is_pos).sum() / n_pos
+cascade_recall = (cascade_pos & is_pos).sum() / n_pos
+print(f"Prefilter (recall target {PREFILTER_RECALL:.3f}, threshold {prefilter['threshold']:.3f}):")
+print(f"  prefilter recall on held-out positives: {(passed & is_pos).sum() / n_pos:.3f}")
+print(f"  classifier recall {clf_recall:.3f} -> cascade recall {cascade_recall:.3f} (lost {clf_recall - cascade_recall:.3f})")
+print(f"  cascade F1: {f1_score(y_test, cascade_pos.astype(int)):.2f}")
+print(f"  held-out sentences skipping the embedder: {1 - passed.mean():.1%}")
+
+joblib.dump(prefilter, PREFILTER_PATH)
+print(f"Lexical prefilter saved to {PREFILTER_PATH}")
+
+# 9. Optionally export the int8 backend and report how far it drifts from the fp32 model
+if EXPORT_INT8:
+    export_quantized(embedder, clf)
+    report = agreement((embedder, clf), load_quantized(), texts)
+    print(f"Int8 embedder and classifier arrays saved to {QUANTIZED_DIR}")
+    print(
+        f"  classifications differing from fp32: {report['differing']}/{report['sentences']} "
+        f"(positives {report['reference_positives']} -> {report['candidate_positives']}, "
+        f"max probability difference {report['max_abs_prob_diff']:.4f})"
+    )
+elif QUANTIZED_DIR.exists():
+    # An export of the previous model would otherwise be picked up by the extractor
+    shutil.rmtree(QUANTIZED_DIR)
+    print(f"Removed stale int8 export {QUANTIZED_DIR} (rerun with EXPORT_INT8=1 to refresh it)")